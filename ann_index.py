@@ -0,0 +1,122 @@
+import threading
+import numpy as np
+
+BRUTE_FORCE_BELOW = 4096  # Exact search is cheaper than clustering for small sets
+KMEANS_ITERS = 10
+KMEANS_SAMPLE = 20000     # Vectors used to train centroids
+
+
+class IVFIndex:
+    """Inverted-file ANN index over unit vectors (cosine = dot product)
+
+    Vectors are clustered with spherical k-means, a query only scans the
+    lists of its `nprobe` closest centroids.
+    """
+
+    def __init__(self, dim: int = 768, nprobe: int = 8, seed: int = 0):
+        self.dim = dim
+        self.nprobe = nprobe
+        self.rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+        self.terms = []
+        self.positions = {}  # term => row
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.centroids = None  # None => exact search
+        self.lists = []        # Row indices per centroid
+        self.trained_size = 0  # Vectors when the centroids were trained
+
+    def clear(self):
+        """Forget every vector (e.g. before re-adding only live terms)"""
+
+        with self._lock:
+            self.terms = []
+            self.positions = {}
+            self.vectors = np.empty((0, self.dim), dtype=np.float32)
+            self.centroids = None
+            self.lists = []
+            self.trained_size = 0
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __contains__(self, term):
+        return term in self.positions
+
+    def _train(self):
+        """Cluster current vectors and rebuild the inverted lists"""
+
+        n = len(self.vectors)
+        nlist = max(1, int(np.sqrt(n)))
+        sample = self.vectors[self.rng.choice(n, size=min(n, KMEANS_SAMPLE), replace=False)]
+
+        centroids = sample[self.rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(KMEANS_ITERS):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assign == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+
+        self.centroids = centroids
+        self.trained_size = n
+        self.lists = [[] for _ in range(nlist)]
+        self._assign(np.arange(n))
+
+    def _assign(self, rows):
+        """Put rows into the list of their closest centroid"""
+
+        for start in range(0, len(rows), 4096):
+            chunk = rows[start:start + 4096]
+            for row, c in zip(chunk, np.argmax(self.vectors[chunk] @ self.centroids.T, axis=1)):
+                self.lists[c].append(row)
+
+    def add(self, terms: list[str], vectors: np.ndarray):
+        """Add new terms, retraining once the set outgrows exact search"""
+
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            fresh = [(t, v) for t, v in zip(terms, vectors) if t not in self.positions]
+            if not fresh:
+                return
+
+            start = len(self.terms)
+            for t, _ in fresh:
+                self.positions[t] = len(self.terms)
+                self.terms.append(t)
+            self.vectors = np.vstack([self.vectors, np.stack([v for _, v in fresh])])
+
+            # Retrain when switching to IVF or when the set has doubled since training
+            # (lists also hold rows assigned since, so they can't tell the trained size)
+            if len(self.terms) >= BRUTE_FORCE_BELOW and (
+                    self.centroids is None or len(self.terms) > 2 * self.trained_size):
+                self._train()
+            elif self.centroids is not None:
+                self._assign(np.arange(start, len(self.terms)))
+
+    def search(self, queries: np.ndarray, threshold: float = 0.92) -> list[list[str]]:
+        """Return, per query vector, the stored terms with similarity >= threshold"""
+
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            if not self.terms:
+                return [[] for _ in queries]
+
+            # Exact: one matmul over everything
+            if self.centroids is None:
+                hits = (queries @ self.vectors.T) >= threshold
+                return [[self.terms[i] for i in np.flatnonzero(row)] for row in hits]
+
+            # Approximate: only scan the closest lists
+            nprobe = min(self.nprobe, len(self.centroids))
+            probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :nprobe]
+            results = []
+            for q, lists in zip(queries, probes):
+                rows = np.fromiter((r for c in lists for r in self.lists[c]), dtype=np.int64)
+                if not len(rows):
+                    results.append([])
+                    continue
+                sims = self.vectors[rows] @ q
+                results.append([self.terms[r] for r in rows[sims >= threshold]])
+            return results
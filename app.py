@@ -1,12 +1,17 @@
 import os
 import json
+import base64
+import sqlite3
+import metrics
+import sessions
+import partitions
+import response_cache
 
 from typing import Literal
-from flask_session import Session
-from newspaper import Article, Config
 from datetime import date, datetime, timedelta
-from helpers import login_required, get_db, db_teardown
-from flask import Flask, flash, session, render_template, request, redirect, jsonify
+from helpers import login_required, get_db, db_teardown, delete_article_rows
+from text_cache import get_text, fetch_text, store_text, touch_text
+from flask import Flask, flash, session, render_template, request, redirect, jsonify, make_response
 
 # Blueprints
 from auth import auth_bp, oauth
@@ -18,32 +23,75 @@ load_dotenv()  # Always load this first
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY")
 
-# Configure session to use filesystem (instead of signed cookies)
+# Configure session to use the sessions table by default (SESSION_BACKEND, see sessions.py)
 app.config["SESSION_PERMANENT"] = False
-app.config["SESSION_TYPE"] = "filesystem"
-Session(app)
+sessions.init_app(app)
 
 oauth.init_app(app)  # Sets up Authlib OAuth with Flask
 db_teardown(app)     # Register db teardown
+metrics.init_app(app)  # Request timings, Server-Timing header and /metrics
 
 # https://realpython.com/flask-blueprint/
 # Register blueprints
 app.register_blueprint(auth_bp)
 app.register_blueprint(settings_bp)
 
-config = Config()
-config.browser_user_agent = os.environ.get("USER_AGENT")
+PAGE_SIZE = 20  # Articles per dashboard page
 
-# Disable data cache (Ensures fresh content)
+# Rendered dashboard pages per (user, tab, cursor, versions), see cached_page
+page_cache = response_cache.ResponseCache()
+
+# Pages change with the templates, so cached copies and browser ETags do too
+TEMPLATES_STAMP = max(
+    (e.stat().st_mtime_ns for e in os.scandir(os.path.join(app.root_path, "templates"))), default=0)
+
+# Disable data cache (Ensures fresh content), unless the view validates its own (ETag)
 @app.after_request
 def after_request(response):
     """Ensure responses aren't cached"""
+    if "ETag" in response.headers:
+        return response
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
     response.headers["Expires"] = 0
     response.headers["Pragma"] = "no-cache"
     return response
 
 
+def cached_page(render, *key):
+    """Serve a page from the per-user cache (or 304 if the browser has it), else render, store and serve it"""
+
+    # Pending flash messages would be baked into the page
+    if session.get("_flashes"):
+        return render()
+
+    db = get_db()
+    user_id = session["user_id"]
+    key = (user_id, session.get("user_photo"), partitions.today().isoformat(), TEMPLATES_STAMP, *key)
+    version = response_cache.versions(db, user_id)
+    etag = response_cache.etag(key + version)
+
+    if etag in request.if_none_match:
+        response_cache.CACHE_REQUESTS.inc(cache="pages", result="not_modified")
+        response = app.response_class(status=304)
+    else:
+        entry = page_cache.get(key + version)
+        if entry is None:
+            response = make_response(render())
+            if response.status_code != 200:
+                return response  # e.g. redirected to set preferences
+
+            # Only keep it if nothing changed while rendering
+            entry = (response.get_data(), response.mimetype)
+            if response_cache.versions(db, user_id) == version:
+                page_cache.put(key + version, entry)
+        response = app.response_class(entry[0], mimetype=entry[1])
+
+    # Browser keeps the page but asks every time (private: per user)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
 @app.route("/")
 @login_required
 def dashboard():
@@ -55,14 +103,60 @@ def dashboard():
     if tab not in ["all", "new", "old"]:
         tab = "all"
 
-    articles = get_articles(tab)  # Get relevant articles
+    cursor = request.args.get("cursor")
 
-    # Notify users of new articles if any
-    newly_fetched = len(get_articles("new"))
-    if newly_fetched > 0:
-        flash(f"{newly_fetched} new articles available for you today!", "info")
-        
-    return render_template("dashboard.html", articles=articles, current_tab=tab)
+    def render():
+        # Get relevant articles (one page) and today's count in one query
+        result = get_articles(tab, cursor)
+        if result is None:
+            flash("Please set your preferences to get started.", "error")
+            return redirect("/preferences")
+
+        articles, newly_fetched, next_cursor = result
+
+        # Notify users of new articles if any (first page only)
+        if newly_fetched > 0 and not cursor:
+            flash(f"{newly_fetched} new articles available for you today!", "info")
+
+        return render_template(
+            "dashboard.html",
+            articles=articles,
+            current_tab=tab,
+            next_cursor=next_cursor,
+            offset=0
+        )
+
+    return cached_page(render, "dashboard", tab, cursor)
+
+
+@app.route("/articles")
+@login_required
+def articles_page():
+    """Return the next page of articles as JSON (for infinite scroll)"""
+
+    tab = request.args.get("tab", "all")
+    if tab not in ["all", "new", "old"]:
+        tab = "all"
+
+    # Offset only keeps collapse ids unique on the page, paging uses the cursor
+    try:
+        offset = max(0, int(request.args.get("offset", 0)))
+    except ValueError:
+        offset = 0
+
+    cursor = request.args.get("cursor")
+
+    def render():
+        result = get_articles(tab, cursor)
+        if result is None:
+            return jsonify({"error": "No preferences set"}), 400
+
+        articles, _, next_cursor = result
+        html = render_template("article_cards.html", articles=articles, offset=offset)
+
+        return jsonify({"articles": articles, "html": html, "next_cursor": next_cursor})
+
+    return cached_page(render, "articles", tab, cursor, offset)
 
 
 @app.route("/extract-article")
@@ -75,20 +169,38 @@ def extract_article():
     if not url:
         return jsonify({"e": "Missing URL parameter"}), 400
 
-    # Try parsing text from url
+    db = get_db()
+
+    # Serve text stored at ingestion (or by an earlier click)
+    cached = get_text(db, url)
+    if cached and not cached["stale"]:
+        return cached["text"], 200, {"Content-Type": "text/plain; charset=utf-8"}
+
+    # Try parsing text from url, revalidating a stale copy if there is one
     try:
-        article = Article(url, config=config)
-        article.download()
-        article.parse()
+        text, etag, last_modified = fetch_text(
+            url,
+            etag=cached["etag"] if cached else None,
+            last_modified=cached["last_modified"] if cached else None)
+
+        # Not modified since cached
+        if text is None and cached:
+            touch_text(db, url)
+            return cached["text"], 200, {"Content-Type": "text/plain; charset=utf-8"}
+
         # Extract clean text and validate
-        text = article.text.strip()
         if not text:
             return jsonify({"e": "No article text found"}), 404
 
+        store_text(db, url, None, text, etag, last_modified)
+        db.commit()
         return text, 200, {"Content-Type": "text/plain; charset=utf-8"}
     # Maybe broken link
     except Exception as e:
         print("Extraction failed:", e)  # For debugging
+        # Stale text beats no text
+        if cached:
+            return cached["text"], 200, {"Content-Type": "text/plain; charset=utf-8"}
         return jsonify({"e": "Failed to fetch article text."}), 500
     
 
@@ -107,6 +219,7 @@ def update_summary():
     try:
         db = get_db()
         db.execute("UPDATE articles SET summary = ? WHERE id = ?", (summary, article_id))
+        response_cache.bump(db, response_cache.ARTICLES)  # Summaries are shown to every user
         db.commit()
         return jsonify({"success": True})
     
@@ -121,54 +234,109 @@ def delete_article(id):
     """Let user delete article"""
 
     db = get_db()
-    db.execute("DELETE FROM articles WHERE id = ?", (id,))
+    delete_article_rows(db, [id])
     db.commit()
     flash("Article deleted.", "success")
     return redirect("/")
 
 
-# Limit params to all, new, old
-def get_articles(filter_mode: Literal["all", "new", "old"] = "all"):
-    """Fetch and filter articles based on user's keywords and date."""
+def encode_cursor(fetched_at, article_id):
+    """Opaque keyset cursor for the last article on a page"""
 
-    db = get_db()
-    filtered_articles = []
+    raw = json.dumps([fetched_at, article_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
-    # Ensure user has keyword preferences
-    prefs = db.execute("SELECT keywords FROM preferences WHERE user_id = ?", (session["user_id"],)).fetchone()
-    if not prefs:
-        flash("Please set your preferences to get started.", "error")
-        return redirect("/preferences")
 
-    user_keywords = json.loads(prefs["keywords"])  # Get keywords string
+def decode_cursor(cursor):
+    """Return (fetched_at, id) from a cursor, or None if missing/invalid"""
 
-    # Dynamic placeholders for keyword filter
-    placeholders = " OR ".join(["keywords LIKE ?"] * len(user_keywords))
-    params = [f"%{word}%" for word in user_keywords]
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        fetched_at, article_id = json.loads(raw)
+        return str(fetched_at), str(article_id)
+    except (ValueError, TypeError):
+        return None  # Start from the first page
+
+
+# Limit params to all, new, old
+def get_articles(filter_mode: Literal["all", "new", "old"] = "all", cursor: str = None, limit: int = PAGE_SIZE,
+                 retried: bool = False):
+    """Return (page of articles, count of today's articles, next cursor), or None if user has no preferences"""
+
+    db = get_db()
+    filtered_articles = []
 
-    # Date condition in query
-    today_str = date.today().isoformat()
-    date_condition = ""
+    # fetched_at is a UTC date, "today" is too
+    params = {"user_id": session["user_id"], "today": partitions.today().isoformat(), "limit": limit + 1}
 
+    # Date condition for the selected tab
+    conditions = ""
     if filter_mode == "new":
-        date_condition = "AND fetched_at = ?"  # Today
-        params.append(today_str)
+        conditions += " AND a.fetched_at = :today"  # Today
 
     elif filter_mode == "old":
-        date_condition = "AND fetched_at < ?"  # Previous days
-        params.append(today_str)
-
-    # Execute query
-    query = f"""
-        SELECT id, article_url, source, pub_date, title, summary, fetched_at
-        FROM articles
-        WHERE ({placeholders}) {date_condition}
-        ORDER BY fetched_at DESC
+        conditions += " AND a.fetched_at < :today"  # Previous days
+
+    # Keyset pagination: seek past the last (fetched_at, id) seen, straight down idx_articles_fetched_at
+    after = decode_cursor(cursor)
+    if after:
+        conditions += " AND (a.fetched_at, a.id) < (:after_at, :after_id)"
+        params["after_at"], params["after_id"] = after
+
+    # With per-day partitions the tab only reads its days' tables (plain `articles` otherwise)
+    source = partitions.articles_source(db, filter_mode)
+    today_source = partitions.articles_source(db, "new")
+
+    # Today's count is only shown on the first page. Uncorrelated subqueries run once, apart from the page.
+    new_count = "NULL" if after else f"""(
+        SELECT COUNT(*) FROM {today_source} t
+        WHERE t.fetched_at = :today
+        AND EXISTS (SELECT 1 FROM user_relevance r WHERE r.user_id = :user_id AND r.article_id = t.id))"""
+    header = f"""
+        SELECT {new_count} AS new_count,
+            EXISTS (SELECT 1 FROM preferences WHERE user_id = :user_id) AS has_prefs"""
+
+    # One statement: the page walks articles newest first and stops after limit + 1 relevant rows
+    # (one extra row tells if there is a next page)
+    query = f"""{header},
+            a.id, a.article_url, a.source, a.pub_date, a.title, a.summary, a.fetched_at
+        FROM {source} a
+        WHERE EXISTS (SELECT 1 FROM user_relevance r WHERE r.user_id = :user_id AND r.article_id = a.id)
+        {conditions}
+        ORDER BY a.fetched_at DESC, a.id DESC
+        LIMIT :limit
     """
-    articles = db.execute(query, params).fetchall()
+    try:
+        articles = db.execute(query, params).fetchall()
+        if not articles:
+            # Empty tab: still need the preference check and count
+            articles = [dict(db.execute(header, params).fetchone(), id=None)]
+    except sqlite3.OperationalError:
+        if not partitions.enabled() or retried:
+            raise
+        # Another process dropped or added a partition since the list was cached
+        partitions.invalidate()
+        return get_articles(filter_mode, cursor, limit, retried=True)
+
+    # Ensure user has keyword preferences
+    if not articles[0]["has_prefs"]:
+        return None
+
+    new_count = articles[0]["new_count"]
+
+    # Only the current page gets formatted
+    next_cursor = None
+    if len(articles) > limit:
+        articles = articles[:limit]
+        last = articles[-1]
+        next_cursor = encode_cursor(last["fetched_at"], last["id"])
 
     # Format for front end
     for a in articles:
+        if a["id"] is None:
+            continue  # Empty tab
         
         # Expiry countdown
         fetched_date = datetime.fromisoformat(a["fetched_at"]).date()
@@ -176,7 +344,7 @@ def get_articles(filter_mode: Literal["all", "new", "old"] = "all"):
 
         filtered_articles.append({
             "id": a["id"],
-            "url": a["article_url"],
+            "article_url": a["article_url"],
             "source": a["source"],
             "expiry": countdown,
             "pub_date": a["pub_date"] or "-",
@@ -184,7 +352,7 @@ def get_articles(filter_mode: Literal["all", "new", "old"] = "all"):
             "summary": a["summary"] or ""
         })
 
-    return filtered_articles
+    return filtered_articles, new_count, next_cursor
 
 
 def compute_expiry(fetched_at: date):
@@ -192,7 +360,7 @@ def compute_expiry(fetched_at: date):
 
     # Expires in 5 days from fetch date
     expires_at = fetched_at + timedelta(days=5)
-    countdown = (expires_at - date.today()).days
+    countdown = (expires_at - partitions.today()).days
     return countdown
 
 
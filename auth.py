@@ -1,9 +1,10 @@
 import os
 import sqlite3
+import sessions
 
 from helpers import get_db
 from authlib.integrations.flask_client import OAuth
-from flask import Blueprint, render_template, request, redirect, session, flash, url_for
+from flask import Blueprint, render_template, request, redirect, session, flash, url_for, current_app
 
 # https://realpython.com/flask-blueprint/
 # Define blueprint for all user auth routes
@@ -74,6 +75,7 @@ def callback():
             flash("Email not verified.", "error")
             return redirect("/login")
         
+    sessions.regenerate(current_app, session)  # Logged in under a new id
     session["user_id"] = user_id
     session["user_photo"] = photo
 
@@ -0,0 +1,242 @@
+"""Dashboard load test: concurrent logged-in users against a seeded database
+
+Run from the repo root:
+    python -m benchmarks.bench_dashboard [--articles 1000 10000 100000] [--users 50]
+        [--concurrency 8] [--duration 10] [--read-only] [--out benchmarks/results/dashboard.jsonl]
+
+Each size runs in its own process: a temporary database is seeded with
+synthetic users, preferences and articles, the app is served by a threaded
+WSGI server, and workers hit /, /?tab=new, /update-summary and
+/delete-article/<id> with real session cookies. p50/p95/p99 latency and
+requests/sec are reported per endpoint and appended as one JSON line per size.
+--read-only leaves out the edits and deletes, which invalidate cached pages.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUT = os.path.join(ROOT, "benchmarks", "results", "dashboard.jsonl")
+
+# Share of requests per endpoint
+MIX = {"all": 0.45, "new": 0.35, "update-summary": 0.15, "delete": 0.05}
+READS = ("all", "new")
+VOCABULARY_SIZE = 200
+KEYWORDS_PER_USER = 8
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an already sorted list"""
+
+    if not ordered:
+        return None
+    rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def summarize(samples, elapsed):
+    """{endpoint: count, errors, rps, p50/p95/p99 ms} from (endpoint, seconds, ok) samples"""
+
+    by_endpoint = {}
+    for endpoint, seconds, ok in samples:
+        by_endpoint.setdefault(endpoint, []).append((seconds, ok))
+    by_endpoint["total"] = [(seconds, ok) for _, seconds, ok in samples]
+
+    summary = {}
+    for endpoint, rows in by_endpoint.items():
+        latencies = sorted(seconds * 1000 for seconds, _ in rows)
+        summary[endpoint] = {
+            "requests": len(rows),
+            "errors": sum(not ok for _, ok in rows),
+            "rps": round(len(rows) / elapsed, 1) if elapsed else None,
+            **{f"p{p}_ms": round(percentile(latencies, p), 2) for p in (50, 95, 99)},
+        }
+    return summary
+
+
+def seed(db, articles, users, rng):
+    """Synthetic users with preferences and articles, relevance computed the app's way"""
+
+    from benchmarks.seed import add_user, add_articles, words
+    from helpers import refresh_user_relevance
+
+    vocabulary = words(VOCABULARY_SIZE)
+    user_ids = [add_user(db, n, rng.sample(vocabulary, KEYWORDS_PER_USER)) for n in range(users)]
+    article_ids = add_articles(db, articles, vocabulary)
+    for user_id in user_ids:
+        refresh_user_relevance(db, user_id)
+    db.commit()
+    return user_ids, article_ids
+
+
+def login(app, user_id):
+    """Session cookie for user_id, stored by the app's own session interface"""
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = user_id
+    return client.get_cookie(app.config.get("SESSION_COOKIE_NAME", "session")).value
+
+
+def worker(base_url, cookies, article_ids, deletable, samples, stop, seed_value, mix=MIX):
+    """Send a weighted mix of requests until stopped"""
+
+    import requests
+
+    rng = random.Random(seed_value)
+    http = requests.Session()  # Keep-alive, like a browser
+    endpoints, weights = zip(*mix.items())
+    local = []
+
+    while not stop.is_set():
+        endpoint = rng.choices(endpoints, weights)[0]
+        http.cookies.set("session", rng.choice(cookies))
+
+        start = time.perf_counter()
+        if endpoint == "all":
+            response = http.get(f"{base_url}/")
+        elif endpoint == "new":
+            response = http.get(f"{base_url}/?tab=new")
+        elif endpoint == "update-summary":
+            response = http.post(f"{base_url}/update-summary", json={
+                "article_id": rng.choice(article_ids), "summary": f"Summary {rng.random():.6f}"})
+        else:
+            try:
+                article_id = deletable.pop()
+            except IndexError:
+                continue  # Nothing left to delete
+            response = http.get(f"{base_url}/delete-article/{article_id}", allow_redirects=False)
+        seconds = time.perf_counter() - start
+
+        ok = response.status_code < 400 and "/login" not in response.headers.get("Location", "")
+        local.append((endpoint, seconds, ok))
+
+    samples.extend(local)  # list.extend is atomic
+
+
+def run_once(articles, users, concurrency, duration, read_only=False):
+    """One measured load test in this (fresh) process, returns the result dict"""
+
+    workdir = tempfile.mkdtemp(prefix="bench-dashboard-")
+    os.chdir(workdir)  # Filesystem sessions and the embedding store are written here
+    os.environ["TECHNUS_DB"] = os.path.join(workdir, "technus.db")
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ.setdefault("GEMINI_API_KEY", "bench")
+
+    from benchmarks.seed import create_db
+    create_db(os.environ["TECHNUS_DB"]).close()
+
+    import partitions
+    from helpers import thread_db, init_schema
+    from werkzeug.serving import make_server
+
+    rng = random.Random(0)
+    db = thread_db()
+    init_schema(db)  # Derived tables first, so seeding fills them directly (no backfill)
+
+    start = time.perf_counter()
+    user_ids, article_ids = seed(db, articles, users, rng)
+    seed_s = time.perf_counter() - start
+
+    from app import app
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    cookies = [login(app, user_id) for user_id in user_ids]
+    deletable = rng.sample(article_ids, min(len(article_ids), 5000))
+
+    mix = {endpoint: weight for endpoint, weight in MIX.items() if endpoint in READS or not read_only}
+    samples, stop = [], threading.Event()
+    threads = [
+        threading.Thread(target=worker, args=(base_url, cookies, article_ids, deletable, samples, stop, n, mix))
+        for n in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    return {
+        "articles": articles,
+        "users": users,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "seed_s": round(seed_s, 3),
+        "partitions": partitions.enabled(),
+        "read_only": read_only,
+        "endpoints": summarize(samples, elapsed),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--articles", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load per size")
+    parser.add_argument("--read-only", action="store_true", help="only dashboard views, no edits or deletes")
+    parser.add_argument("--out", default=DEFAULT_OUT, help="JSON lines file results are appended to")
+    parser.add_argument("--run", type=int, help=argparse.SUPPRESS)  # Child process: one size, result on stdout
+    args = parser.parse_args()
+
+    if args.run:
+        result = run_once(args.run, args.users, args.concurrency, args.duration, args.read_only)
+        print("BENCH_RESULT " + json.dumps(result))
+        return
+
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    revision = git_revision()
+    results = []
+
+    for size in args.articles:
+        child = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_dashboard", "--run", str(size), "--users", str(args.users),
+             "--concurrency", str(args.concurrency), "--duration", str(args.duration)]
+            + (["--read-only"] if args.read_only else []),
+            cwd=ROOT, env=env, capture_output=True, text=True)
+        line = next((l for l in child.stdout.splitlines() if l.startswith("BENCH_RESULT ")), None)
+        if child.returncode or not line:
+            print(child.stdout[-2000:], child.stderr[-2000:], sep="\n")
+            sys.exit(f"Run with {size} articles failed")
+
+        result = json.loads(line.split(" ", 1)[1])
+        result.update(revision=revision, timestamp=datetime.now().isoformat(timespec="seconds"))
+        results.append(result)
+
+        print(f"{size} articles, {args.users} users, {args.concurrency} concurrent (seeded in {result['seed_s']}s)")
+        print(f"  {'endpoint':<16}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for endpoint, s in result["endpoints"].items():
+            print(f"  {endpoint:<16}{s['requests']:>9}{s['errors']:>8}{s['rps']:>9}"
+                  f"{s['p50_ms']:>9}{s['p95_ms']:>9}{s['p99_ms']:>9}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "a", encoding="utf-8") as f:
+        f.writelines(json.dumps(r) + "\n" for r in results)
+    print(f"Results appended to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
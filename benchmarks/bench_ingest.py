@@ -0,0 +1,304 @@
+"""Ingestion benchmark: recorded feeds, pages and embeddings replayed through fetch_tech_articles
+
+Run from the repo root:
+    python -m benchmarks.bench_ingest [--sizes 10 100 1000] [--latency 0.0] [--out benchmarks/results/ingest.jsonl]
+
+Nothing touches the network: Google News RSS, NewsData JSON and article html
+are cloned from benchmarks/fixtures, embeddings come from the fake embedding
+server. Each size runs in its own process (temporary database, embedding store
+and working directory) so peak RSS is per run. One JSON line per size is
+appended to --out for comparison over time.
+"""
+
+import io
+import os
+import sys
+import json
+import math
+import time
+import zlib
+import random
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+import xml.etree.ElementTree as ET
+
+from copy import deepcopy
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from urllib.parse import urlsplit, parse_qs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures")
+DEFAULT_OUT = os.path.join(ROOT, "benchmarks", "results", "ingest.jsonl")
+
+PER_QUERY = 10        # Items per feed response (the fetcher's own limit)
+FALLBACK_EVERY = 5    # About one query in this many fails on Google News, exercising the NewsData path
+TITLE_WORDS = ("new", "chip", "cloud", "model", "launch", "startup", "funding", "security", "open", "source",
+               "data", "center", "device", "update", "research", "team", "market", "users", "platform", "tools")
+
+
+class Response:
+    """Just enough of requests.Response for the fetcher"""
+
+    def __init__(self, url, status_code=200, body=b"", headers=None):
+        self.url = url
+        self.status_code = status_code
+        self.content = body
+        self.headers = headers or {}
+        self.raw = io.BytesIO(body)
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.HTTPError(f"{self.status_code} for {self.url}", response=self)
+
+    def close(self):
+        pass
+
+
+class Replay:
+    """Stands in for the fetcher's requests.Session, serving cloned fixtures
+
+    Feed items are handed out until `articles` have been listed, so a run
+    ingests exactly that many articles.
+    """
+
+    def __init__(self, articles, latency=0.0, seed=0):
+        with open(os.path.join(FIXTURES, "google_news_rss.xml"), "rb") as f:
+            self.rss = ET.fromstring(f.read())
+        with open(os.path.join(FIXTURES, "newsdata_latest.json"), "r", encoding="utf-8") as f:
+            self.newsdata = json.load(f)
+        with open(os.path.join(FIXTURES, "article.html"), "r", encoding="utf-8") as f:
+            self.html = f.read()
+
+        self.remaining = articles
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.redirects = {}  # Google link => article url
+        self.pages = {}      # Article url => (title, topic)
+        self.counts = {"google": 0, "newsdata": 0, "redirect": 0, "article": 0}
+
+    def _take(self):
+        with self._lock:
+            n = min(PER_QUERY, self.remaining)
+            self.remaining -= n
+            return n
+
+    def _title(self, topic):
+        with self._lock:
+            words = self.rng.sample(TITLE_WORDS, 6)
+        return " ".join([topic.capitalize()] + words)  # Distinct titles, so dedup keeps every article
+
+    def head(self, url, **kwargs):
+        return self.get(url, **kwargs)
+
+    def get(self, url, params=None, headers=None, timeout=None, stream=False, allow_redirects=True, **kwargs):
+        time.sleep(self.latency)
+        parts = urlsplit(url)
+
+        if parts.netloc == "news.google.com" and parts.path.startswith("/rss/search"):
+            return self._google(parse_qs(parts.query)["q"][0].split("+topic:")[0])
+        if parts.netloc == "news.google.com" and parts.path.startswith("/rss/articles/"):
+            with self._lock:
+                self.counts["redirect"] += 1
+            return Response(self.redirects.get(url, url))
+        if parts.netloc == "newsdata.io":
+            return self._newsdata(params["q"])
+        if url in self.pages:
+            return self._page(url)
+        return Response(url, 404)
+
+    def _google(self, query):
+        with self._lock:
+            self.counts["google"] += 1
+        if zlib.crc32(query.encode()) % FALLBACK_EVERY == 0:
+            return Response("https://news.google.com/rss/search", 503)
+
+        topics = query.split(" OR ")
+        rss = deepcopy(self.rss)
+        channel = rss.find("channel")
+        template = channel.find("item")
+        channel.remove(template)
+
+        now = format_datetime(datetime.now(timezone.utc))
+        for i in range(self._take()):
+            guid = f"{zlib.crc32(query.encode()):08x}{i:02d}"
+            topic = topics[i % len(topics)]
+            title = self._title(topic)
+            link = f"https://news.google.com/rss/articles/{guid}?oc=5"
+            page = f"https://www.theverge.com/2025/10/18/{guid}/{title.lower().replace(' ', '-')}"
+
+            item = deepcopy(template)
+            item.find("title").text = f"{title} - The Verge"
+            item.find("link").text = link
+            item.find("guid").text = guid
+            item.find("pubDate").text = now
+            channel.append(item)
+            with self._lock:
+                self.redirects[link] = page
+                self.pages[page] = (title, topic)
+
+        return Response("https://news.google.com/rss/search", 200, ET.tostring(rss, encoding="utf-8"))
+
+    def _newsdata(self, query):
+        with self._lock:
+            self.counts["newsdata"] += 1
+
+        topics = query.split(" OR ")
+        data = deepcopy(self.newsdata)
+        template = data["results"][0]
+        data["results"] = []
+
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for i in range(self._take()):
+            article_id = f"nd{zlib.crc32(query.encode()):08x}{i:02d}"
+            topic = topics[i % len(topics)]
+            title = self._title(topic)
+            link = f"https://www.techcrunch.com/2025/10/18/{article_id}/"
+
+            result = dict(template, article_id=article_id, title=title, link=link, pubDate=now, keywords=[topic])
+            data["results"].append(result)
+            with self._lock:
+                self.pages[link] = (title, topic)
+
+        data["totalResults"] = len(data["results"])
+        return Response("https://newsdata.io/api/1/latest", 200, json.dumps(data).encode())
+
+    def _page(self, url):
+        with self._lock:
+            self.counts["article"] += 1
+        title, topic = self.pages[url]
+        html = self.html.replace("{title}", title).replace("{topic}", topic).replace("{url}", url)
+        return Response(url, 200, html.encode(), {"ETag": f'"{zlib.crc32(url.encode()):08x}"'})
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process and of its finished children (NLP pool), in MB"""
+
+    # ru_maxrss is KB on Linux, bytes on macOS
+    scale = 1 / (1024 * 1024) if sys.platform == "darwin" else 1 / 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return round(own, 1), round(children, 1)
+
+
+def run_once(articles, latency):
+    """One measured ingestion run in this (fresh) process, returns the result dict"""
+
+    workdir = tempfile.mkdtemp(prefix="bench-ingest-")
+    os.chdir(workdir)  # Embedding store and caches are written here
+
+    # Configure before the app modules read their settings on import
+    from benchmarks.fake_embedding_server import serve, FakeEmbeddingHandler
+    from benchmarks.seed import create_db, add_user, words
+
+    server = serve(0)
+    os.environ["GEMINI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ.setdefault("GEMINI_API_KEY", "bench")
+    os.environ["TECHNUS_DB"] = os.path.join(workdir, "technus.db")
+
+    import fetch_news
+    from helpers import thread_db
+    from embedding_client import embedding_client
+
+    # Enough keyword batches that every article has a query to come from
+    queries = math.ceil(articles / PER_QUERY)
+    count = queries
+    while len(list(fetch_news.batch_keywords(words(count)))) < queries:
+        count += queries
+    db = create_db(os.environ["TECHNUS_DB"])
+    add_user(db, 1, words(count))
+    db.commit()
+    db.close()
+
+    replay = Replay(articles, latency)
+    fetch_news.http = replay
+    fetch_news.redirect_resolver.session = replay
+
+    start = time.perf_counter()
+    report = fetch_news.fetch_tech_articles()
+    wall = time.perf_counter() - start
+
+    stored = thread_db().execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+    fetch_news.keyword_extractor.shutdown()  # Children count towards RUSAGE_CHILDREN once reaped
+    rss, children_rss = peak_rss_mb()
+
+    return {
+        "articles": articles,
+        "latency_s": latency,
+        "wall_s": round(wall, 3),
+        "articles_per_s": round(articles / wall, 2) if wall else None,
+        "stored": stored,
+        "peak_rss_mb": rss,
+        "peak_children_rss_mb": children_rss,
+        "embedding_calls": embedding_client.calls,
+        "embedded_terms": FakeEmbeddingHandler.stats["terms"],
+        "nlp_parsed": fetch_news.keyword_extractor.parsed,
+        "requests": replay.counts,
+        "stages": report.stages if report else [],
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every replayed request")
+    parser.add_argument("--out", default=DEFAULT_OUT, help="JSON lines file results are appended to")
+    parser.add_argument("--run", type=int, help=argparse.SUPPRESS)  # Child process: one size, result on stdout
+    args = parser.parse_args()
+
+    if args.run:
+        result = run_once(args.run, args.latency)
+        print("BENCH_RESULT " + json.dumps(result))
+        return
+
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    revision = git_revision()
+    results = []
+
+    for size in args.sizes:
+        child = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_ingest", "--run", str(size), "--latency", str(args.latency)],
+            cwd=ROOT, env=env, capture_output=True, text=True)
+        line = next((l for l in child.stdout.splitlines() if l.startswith("BENCH_RESULT ")), None)
+        if child.returncode or not line:
+            print(child.stdout[-2000:], child.stderr[-2000:], sep="\n")
+            sys.exit(f"Run with {size} articles failed")
+
+        result = json.loads(line.split(" ", 1)[1])
+        result.update(revision=revision, timestamp=datetime.now().isoformat(timespec="seconds"))
+        results.append(result)
+
+        stages = "  ".join(f"{s['stage']} {s['wall_s']}s" for s in result["stages"])
+        print(f"{size:>5} articles: {result['wall_s']:>8}s  {result['articles_per_s']:>8}/s  "
+              f"rss {result['peak_rss_mb']} MB (+{result['peak_children_rss_mb']} MB nlp)  "
+              f"{result['embedding_calls']} embedding calls  {result['stored']} stored")
+        print(f"       {stages}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "a", encoding="utf-8") as f:
+        f.writelines(json.dumps(r) + "\n" for r in results)
+    print(f"Results appended to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Micro-benchmark: per-article semantic matching vs one matmul per batch
+
+Run from the repo root:
+    python -m benchmarks.bench_matching [articles] [keywords_per_article]
+
+Embeddings are random unit vectors in a temporary store, so no API calls are made.
+"""
+
+import sys
+import time
+import tempfile
+import numpy as np
+
+import helpers
+from embedding_store import EmbeddingStore
+
+
+def fake_store(terms, dim, seed=0):
+    """Temporary store with a random unit vector per term"""
+
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(len(terms), dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    store = EmbeddingStore(f"{tempfile.mkdtemp()}/bench", dim=dim)
+    store.add(terms, vectors)
+    return store
+
+
+def timed(func, repeat=5):
+    """Best wall time over a few runs and the last result"""
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(n_articles=200, per_article=12, n_user=8, vocab_size=1500):
+    rng = np.random.default_rng(1)
+    vocab = [f"term {i}" for i in range(vocab_size)]
+    user_kw = vocab[:n_user]
+    articles_kw = [list(rng.choice(vocab, size=per_article, replace=False)) for _ in range(n_articles)]
+
+    # Matching user keywords against themselves guarantees some hits
+    for i in range(0, n_articles, 7):
+        articles_kw[i].append(user_kw[i % n_user])
+
+    helpers.embedding_store = fake_store(vocab, helpers.EMBEDDING_DIM)
+
+    per_article_s, old = timed(lambda: [helpers.get_sematic_matches(user_kw, kw) for kw in articles_kw])
+    batch_s, new = timed(lambda: helpers.get_batch_semantic_matches(user_kw, articles_kw))
+
+    same = [sorted(a) for a in old] == [sorted(b) for b in new]
+    print(f"{n_articles} articles x {per_article} keywords, {n_user} user keywords")
+    print(f"per-article: {per_article_s * 1000:8.2f} ms")
+    print(f"batch:       {batch_s * 1000:8.2f} ms  ({per_article_s / batch_s:.1f}x)")
+    print(f"same matches: {same}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
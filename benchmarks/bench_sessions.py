@@ -0,0 +1,178 @@
+"""Session backend benchmark: per-request overhead of sqlite, cookie and filesystem sessions
+
+Run from the repo root:
+    python -m benchmarks.bench_sessions [--backends sqlite cookie filesystem] [--requests 2000]
+        [--threads 1 8] [--users 200] [--out benchmarks/results/sessions.jsonl]
+
+Each backend runs in its own process (temporary database and working
+directory), selected with SESSION_BACKEND like the app. Logged-in clients
+request a cheap login_required route, so the difference between backends is
+the session load/save. Three cases are timed:
+    read      authenticated request, session unchanged
+    write     authenticated request that changes the session (session_transaction)
+    session   open_session + save_session alone, no routing or view
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+
+from datetime import datetime
+
+from benchmarks.bench_dashboard import percentile, git_revision
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUT = os.path.join(ROOT, "benchmarks", "results", "sessions.jsonl")
+
+PHOTO = "/static/uploads/default.png"
+
+
+def summarize(latencies, elapsed):
+    ordered = sorted(s * 1e6 for s in latencies)
+    return {
+        "requests": len(ordered),
+        "rps": round(len(ordered) / elapsed, 1) if elapsed else None,
+        **{f"p{p}_us": round(percentile(ordered, p), 1) for p in (50, 95, 99)},
+    }
+
+
+def hammer(func, count, threads):
+    """Run func(rng) count times spread over threads, return (latencies, elapsed)"""
+
+    latencies = []
+
+    def work(n, share):
+        rng = random.Random(n)
+        local = []
+        for _ in range(share):
+            start = time.perf_counter()
+            func(rng)
+            local.append(time.perf_counter() - start)
+        latencies.extend(local)  # list.extend is atomic
+
+    workers = [threading.Thread(target=work, args=(n, count // threads)) for n in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return latencies, time.perf_counter() - start
+
+
+def run_once(backend, count, threads, users):
+    """Timings for one backend in this (fresh) process, returns the result dict"""
+
+    workdir = tempfile.mkdtemp(prefix="bench-sessions-")
+    os.chdir(workdir)  # Filesystem sessions are written here
+    os.environ["SESSION_BACKEND"] = backend
+    os.environ["TECHNUS_DB"] = os.path.join(workdir, "technus.db")
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ.setdefault("GEMINI_API_KEY", "bench")
+
+    from benchmarks.seed import create_db
+    create_db(os.environ["TECHNUS_DB"]).close()
+
+    from app import app
+    cookie_name = app.config.get("SESSION_COOKIE_NAME", "session")
+
+    # One logged-in cookie per user, created by the backend itself
+    cookies = []
+    for user_id in range(1, users + 1):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = user_id
+            session["user_photo"] = PHOTO
+        cookies.append(client.get_cookie(cookie_name).value)
+
+    local = threading.local()
+
+    def client(rng):
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        local.client.set_cookie(cookie_name, rng.choice(cookies))
+        return local.client
+
+    def read(rng):
+        response = client(rng).get("/extract-article")  # login_required, then 400 without a url
+        assert response.status_code == 400, response.status_code
+
+    def write(rng):
+        with client(rng).session_transaction() as session:
+            session["user_photo"] = f"{PHOTO}?v={rng.random():.6f}"
+
+    def session_only(rng):
+        interface = app.session_interface
+        request = app.test_request_context(headers={"Cookie": f"{cookie_name}={rng.choice(cookies)}"}).request
+        with app.app_context():  # Not a pushed request context, that would open the session itself
+            session = interface.open_session(app, request)
+            session.get("user_id")
+            interface.save_session(app, session, app.response_class())
+
+    result = {"backend": backend, "threads": threads, "users": users, "cases": {}}
+    for name, func in (("read", read), ("write", write), ("session", session_only)):
+        hammer(func, min(count, 200), threads)  # Warm up caches and connections
+        latencies, elapsed = hammer(func, count, threads)
+        result["cases"][name] = summarize(latencies, elapsed)
+
+    if backend == "filesystem":
+        directory = app.config.get("SESSION_FILE_DIR", os.path.join(workdir, "flask_session"))
+        result["stored_sessions"] = len(os.listdir(directory)) if os.path.isdir(directory) else 0
+    elif backend == "sqlite":
+        from helpers import thread_db
+        result["stored_sessions"] = thread_db().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["sqlite", "cookie", "filesystem"])
+    parser.add_argument("--requests", type=int, default=2000, help="timed requests per case")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--out", default=DEFAULT_OUT, help="JSON lines file results are appended to")
+    parser.add_argument("--run", help=argparse.SUPPRESS)  # Child process: one backend, result on stdout
+    args = parser.parse_args()
+
+    if args.run:
+        result = run_once(args.run, args.requests, args.threads[0], args.users)
+        print("BENCH_RESULT " + json.dumps(result))
+        return
+
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    revision = git_revision()
+    results = []
+
+    print(f"  {'backend':<12}{'threads':>8}  {'case':<9}{'req/s':>10}{'p50 us':>10}{'p95 us':>10}{'p99 us':>10}")
+    for threads in args.threads:
+        for backend in args.backends:
+            child = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_sessions", "--run", backend, "--requests", str(args.requests),
+                 "--threads", str(threads), "--users", str(args.users)],
+                cwd=ROOT, env=env, capture_output=True, text=True)
+            line = next((l for l in child.stdout.splitlines() if l.startswith("BENCH_RESULT ")), None)
+            if child.returncode or not line:
+                print(child.stdout[-2000:], child.stderr[-2000:], sep="\n")
+                sys.exit(f"Run with the {backend} backend failed")
+
+            result = json.loads(line.split(" ", 1)[1])
+            result.update(revision=revision, timestamp=datetime.now().isoformat(timespec="seconds"))
+            results.append(result)
+
+            for case, s in result["cases"].items():
+                print(f"  {backend:<12}{threads:>8}  {case:<9}{s['rps']:>10}{s['p50_us']:>10}{s['p95_us']:>10}"
+                      f"{s['p99_us']:>10}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "a", encoding="utf-8") as f:
+        f.writelines(json.dumps(r) + "\n" for r in results)
+    print(f"Results appended to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Local stand-in for the Gemini batchEmbedContents endpoint
+
+Run from the repo root, then point the app at it:
+    python -m benchmarks.fake_embedding_server --port 8765 [--latency 0.2] [--fail-rate 0.1]
+    GEMINI_BASE_URL=http://127.0.0.1:8765 GEMINI_API_KEY=fake python fetch_news.py
+
+Vectors are seeded from the text, so the same term always gets the same embedding.
+"""
+
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import numpy as np
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_vector(text, dim=768):
+    """Deterministic vector for a piece of text"""
+
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).normal(size=dim).round(6).tolist()
+
+
+class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+    latency = 0.0    # Seconds added to every response
+    fail_rate = 0.0  # Share of requests answered with 429
+    stats = {"requests": 0, "terms": 0, "throttled": 0}
+    lock = threading.Lock()
+
+    def do_POST(self):
+        if not self.path.endswith(":batchEmbedContents"):
+            self.send_error(404)
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(self.latency)
+
+        with self.lock:
+            self.stats["requests"] += 1
+            throttled = random.random() < self.fail_rate
+            self.stats["throttled"] += throttled
+
+        if throttled:
+            self._json(429, {"error": {"code": 429, "message": "Resource exhausted", "status": "RESOURCE_EXHAUSTED"}})
+            return
+
+        embeddings = []
+        for req in body.get("requests", []):
+            text = " ".join(p.get("text", "") for p in req.get("content", {}).get("parts", []))
+            embeddings.append({"values": fake_vector(text, req.get("outputDimensionality") or 768)})
+
+        with self.lock:
+            self.stats["terms"] += len(embeddings)
+        self._json(200, {"embeddings": embeddings})
+
+    def _json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass  # Quiet
+
+
+def serve(port=0, latency=0.0, fail_rate=0.0):
+    """Start the server on a background thread, return it (its port is server.server_port)"""
+
+    FakeEmbeddingHandler.latency = latency
+    FakeEmbeddingHandler.fail_rate = fail_rate
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeEmbeddingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency, args.fail_rate)
+    print(f"Fake embedding server on http://127.0.0.1:{server.server_port}")
+    try:
+        while True:
+            time.sleep(5)
+            print(FakeEmbeddingHandler.stats)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,83 @@
+"""Empty copies of the app database with synthetic users, for benchmarks"""
+
+import os
+import json
+import random
+import string
+import sqlite3
+import partitions
+
+from datetime import date, timedelta
+
+REPO_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "technus.db")
+BASE_TABLES = ("users", "preference_types", "preferences", "articles")
+
+
+def create_db(path):
+    """New database with the app's base tables (no rows), derived tables are made by helpers.init_schema"""
+
+    source = sqlite3.connect(REPO_DB)
+    db = sqlite3.connect(path)
+    for name in BASE_TABLES:
+        sql = source.execute("SELECT sql FROM sqlite_master WHERE name = ?", (name,)).fetchone()[0]
+        db.execute(sql)
+    for (name,) in source.execute("SELECT name FROM preference_types"):
+        db.execute("INSERT INTO preference_types (name) VALUES (?)", (name,))
+    db.commit()
+    source.close()
+    return db
+
+
+def words(count, length=9, prefix="tech"):
+    """Distinct letter-only words (NLP keyword extraction drops digits), sorted"""
+
+    letters = string.ascii_lowercase
+    out = []
+    for i in range(count):
+        suffix = ""
+        for _ in range(length - len(prefix)):
+            i, r = divmod(i, len(letters))
+            suffix = letters[r] + suffix
+        out.append(prefix + suffix)
+    return out
+
+
+def add_user(db, n, keywords):
+    """User n with one preference row holding keywords, returns the user id"""
+
+    cursor = db.execute(
+        "INSERT INTO users (google_id, name, email) VALUES (?, ?, ?)",
+        (f"bench-{n}", f"Bench User {n}", f"bench{n}@example.com"))
+    db.execute(
+        "INSERT INTO preferences (user_id, type_id, keywords) VALUES (?, 1, ?)",
+        (cursor.lastrowid, json.dumps(keywords)))
+    return cursor.lastrowid
+
+
+def add_articles(db, count, vocabulary, per_article=3, days=5, seed=0):
+    """count articles spread over the last `days` fetch days, each tagged with words from vocabulary"""
+
+    rng = random.Random(seed)
+    today = partitions.today()  # fetched_at is a UTC date
+    articles, keywords = [], []
+
+    for i in range(count):
+        article_id = f"bench-{i:07d}"
+        tags = rng.sample(vocabulary, per_article)
+        fetched = today - timedelta(days=i % days)
+        articles.append((
+            article_id, f"https://example.com/{fetched:%Y/%m/%d}/story-{i}", "Example", fetched.isoformat(),
+            json.dumps(tags), f"Story {i} about {' and '.join(tags)}", fetched.isoformat()))
+        keywords.extend((article_id, tag) for tag in tags)
+
+    # Per-day partitions (ARTICLE_PARTITIONS=day) take rows in the day's table, `articles` is a view then
+    tables = {}
+    for row in articles:
+        table = partitions.ensure_partition(db, date.fromisoformat(row[6])) if partitions.enabled() else "articles"
+        tables.setdefault(table, []).append(row)
+    for table, rows in tables.items():
+        db.executemany(
+            f"INSERT INTO {table} (id, article_url, source, pub_date, keywords, title, fetched_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    db.executemany("INSERT OR IGNORE INTO article_keywords (article_id, keyword) VALUES (?, ?)", keywords)
+    return [a[0] for a in articles]
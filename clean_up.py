@@ -1,20 +1,67 @@
-from helpers import get_db
-from datetime import date, datetime, timedelta
+import time
+import partitions
+import redirects
+import sessions
+import keyword_cache
 
-def delete_old_articles():
+from helpers import get_db, delete_article_rows, delete_related_rows, compact_embeddings, embedding_store
+from datetime import datetime, timedelta
+
+CHUNK_SIZE = 500  # Articles deleted per (short) transaction
+
+
+def delete_old_articles(chunk_size=CHUNK_SIZE):
     """Delete articles fetched more than 5 days ago"""
 
     db = get_db()
 
-    # Compute cutoff date
-    cutoff_date = date.today() - timedelta(days=5)
+    # Compute cutoff date (same clock as fetched_at)
+    cutoff_date = partitions.today() - timedelta(days=5)
+
+    start = time.perf_counter()
+    deleted = 0
+
+    if partitions.enabled():
+        # Whole days go at once: related rows first, then DROP TABLE (no row-by-row delete or VACUUM)
+        deleted = partitions.drop_partitions_before(db, cutoff_date, on_drop=lambda ids: delete_related_rows(db, ids))
+    else:
+        # Delete older entries a chunk at a time, so the write lock is only held briefly
+        while True:
+            # Plain comparison on the column (no DATE()) so idx_articles_fetched_at is used
+            ids = [row["id"] for row in db.execute(
+                "SELECT id FROM articles WHERE fetched_at < ? ORDER BY fetched_at LIMIT ?",
+                (cutoff_date.isoformat(), chunk_size))]
+            if not ids:
+                break
 
-    # Delete all older entries
-    db.execute("DELETE FROM articles WHERE DATE(fetched_at) < ?", (cutoff_date,))
-    db.commit()
+            with db:  # Commit each chunk, dashboard writes get in between
+                delete_article_rows(db, ids)
+            deleted += len(ids)
 
-    print(f"[{datetime.now()}] Old articles deleted (fetched before {cutoff_date}).")
+    # NLP results and resolved links outlive articles a little, so a re-listed article costs nothing
+    with db:
+        keyword_cache.purge(db)
+        redirects.purge(db)
+        sessions.purge(db)  # Expired logins too
+
+    elapsed = time.perf_counter() - start
+    rate = deleted / elapsed if elapsed else 0.0
+    print(f"[{datetime.now()}] {deleted} old articles deleted (fetched before {cutoff_date}) "
+          f"in {elapsed:.2f}s ({rate:.0f} rows/sec).")
+    return deleted
+
+
+def compact_embedding_store():
+    """Rewrite the embedding store without terms of expired articles"""
+
+    db = get_db()
+    start = time.perf_counter()
+    dropped = compact_embeddings(db)
+    print(f"[{datetime.now()}] {dropped} unused embeddings dropped in {time.perf_counter() - start:.2f}s, "
+          f"cache: {embedding_store.stats()}")
+    return dropped
 
 
 if __name__ == "__main__":
-    delete_old_articles()
\ No newline at end of file
+    delete_old_articles()
+    compact_embedding_store()
@@ -0,0 +1,136 @@
+import re
+import hashlib
+import threading
+
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "ocid", "cmpid", "ref", "ref_src", "ref_url", "spm",
+    "guccounter", "guce_referrer", "guce_referrer_sig", "ito", "smid", "taid",
+}
+TRACKING_PREFIXES = ("utm_", "at_", "__")
+
+SIMHASH_BITS = 64
+BANDS = 4             # Hamming distance < BANDS => at least one 16-bit band is equal
+MAX_DISTANCE = 3      # Titles this close (in differing bits) are the same story
+MIN_TITLE_WORDS = 4   # Shorter titles are too generic to compare
+
+
+def canonical_url(url):
+    """Same article => same key: lower-case host without www, no tracking params, fragment or trailing slash"""
+
+    if not url:
+        return None
+
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if host.startswith("m.") or host.startswith("amp."):
+        host = host.split(".", 1)[1]  # Mobile and AMP mirrors
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+
+    path = re.sub(r"/+", "/", parts.path or "/")
+    path = re.sub(r"/(amp|amp\.html)$", "", path)  # AMP variants of the same page
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    )
+    return urlunsplit(("https", host, path, urlencode(query), ""))
+
+
+def title_words(title, source=None):
+    """Lower-case words of a title, without a trailing " - Source" (Google News adds one)"""
+
+    title = title or ""
+    if source:
+        for sep in (" - ", " | ", " — "):
+            if title.endswith(f"{sep}{source}"):
+                title = title[:-len(sep + source)]
+                break
+    return re.findall(r"\w+", title.lower())
+
+
+def simhash(words):
+    """64-bit SimHash over words and word pairs, None if there are too few words"""
+
+    if len(words) < MIN_TITLE_WORDS:
+        return None
+
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    weights = [0] * SIMHASH_BITS
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+
+    value = sum(1 << bit for bit, w in enumerate(weights) if w > 0)
+    return value - (1 << 64) if value >= 1 << 63 else value  # Signed, fits an SQLite INTEGER
+
+
+def bands(value):
+    """The fingerprint cut into BANDS equal parts, indexed in the db for near-duplicate lookups"""
+
+    width = SIMHASH_BITS // BANDS
+    value &= (1 << SIMHASH_BITS) - 1
+    return [(value >> (i * width)) & ((1 << width) - 1) for i in range(BANDS)]
+
+
+def distance(a, b):
+    return bin((a ^ b) & ((1 << SIMHASH_BITS) - 1)).count("1")
+
+
+class Fingerprints:
+    """Canonical urls and title hashes of stored (and claimed in-run) articles"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.urls = {}                           # canonical url => article id
+        self.bands = [{} for _ in range(BANDS)]  # band value => [(simhash, article id)]
+
+    @classmethod
+    def load(cls, db):
+        prints = cls()
+        for row in db.execute("SELECT article_id, canonical_url, simhash FROM article_fingerprints"):
+            prints._add(row["article_id"], row["canonical_url"], row["simhash"])
+        return prints
+
+    def _add(self, article_id, url, value):
+        if url:
+            self.urls.setdefault(url, article_id)
+        if value is not None:
+            for i, band in enumerate(bands(value)):
+                self.bands[i].setdefault(band, []).append((value, article_id))
+
+    def find(self, url, value):
+        """Id of a stored article with the same url or a near-identical title, or None"""
+
+        with self._lock:
+            return self._find(url, value)
+
+    def _find(self, url, value):
+        if url in self.urls:
+            return self.urls[url]
+        if value is None:
+            return None
+        for i, band in enumerate(bands(value)):
+            for other, article_id in self.bands[i].get(band, ()):
+                if distance(value, other) <= MAX_DISTANCE:
+                    return article_id
+        return None
+
+    def claim(self, article_id, url, value):
+        """Register an article unless another id already has it, return the id that owns it"""
+
+        with self._lock:
+            owner = self._find(url, value)
+            if owner is None:
+                self._add(article_id, url, value)
+                return article_id
+            return owner
@@ -0,0 +1,148 @@
+import os
+import time
+import random
+import metrics
+import threading
+import numpy as np
+
+from google import genai
+from google.genai import types
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+load_dotenv()  # Always load first
+
+MODEL = "gemini-embedding-001"
+EMBEDDING_DIM = 768
+BATCH_SIZE = 80                                           # Terms per API request
+REQUESTS_PER_MINUTE = int(os.environ.get("EMBED_RPM", 100))  # Quota the token bucket is sized to
+MAX_IN_FLIGHT = int(os.environ.get("EMBED_IN_FLIGHT", 4))    # Concurrent API requests
+MAX_RETRIES = 5
+
+REQUEST_SECONDS = metrics.histogram("embedding_request_seconds", "Time per embedding API request")
+RETRIES = metrics.counter("embedding_retries", "Embedding API requests retried after an error")
+
+# Initialize Client (GEMINI_BASE_URL points it at a local fake server)
+_base_url = os.environ.get("GEMINI_BASE_URL")
+gemini_client = genai.Client(
+    api_key=os.environ.get("GEMINI_API_KEY"),
+    http_options=types.HttpOptions(base_url=_base_url) if _base_url else None
+)
+
+
+class TokenBucket:
+    """Allow `rate` acquisitions per `per` seconds, with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, per: float = 60.0, capacity: float = None):
+        self.fill_rate = rate / per
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until enough tokens are available, then take them"""
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+                self.updated = now
+
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait_for = (tokens - self.tokens) / self.fill_rate
+            time.sleep(wait_for)
+
+
+def gemini_embed(batch: list[str]) -> list[list[float]]:
+    """Embed a batch with the Gemini API"""
+
+    result = gemini_client.models.embed_content(
+        model=MODEL,
+        contents=batch,
+        config=types.EmbedContentConfig(task_type="SEMANTIC_SIMILARITY", output_dimensionality=EMBEDDING_DIM)
+    )
+    return [e.values for e in result.embeddings]
+
+
+class EmbeddingClient:
+    """Rate-limited, retrying, concurrent embedding requests with in-flight dedup"""
+
+    def __init__(self, embed_batch=gemini_embed, requests_per_minute: int = REQUESTS_PER_MINUTE,
+                 batch_size: int = BATCH_SIZE, max_in_flight: int = MAX_IN_FLIGHT,
+                 max_retries: int = MAX_RETRIES, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.embed_batch = embed_batch
+        self.bucket = TokenBucket(requests_per_minute)
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="embed")
+        self._lock = threading.Lock()
+        self._pending = {}  # term => Future, shared by callers asking for the same term
+        self.calls = 0      # API requests made (including retries)
+
+    def _request(self, batch):
+        """One API request with exponential backoff and full jitter"""
+
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                with self._lock:
+                    self.calls += 1
+                with REQUEST_SECONDS.time(result="error") as labels:
+                    vectors = np.array(self.embed_batch(batch), dtype=np.float32)
+                    labels["result"] = "ok"
+                if len(vectors) != len(batch):
+                    raise ValueError(f"Got {len(vectors)} embeddings for {len(batch)} terms")
+                return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)  # Normalize
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                RETRIES.inc()
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                print(f"[Rate-limit or network error] Retry {attempt + 1} in {delay:.1f}s: {e}")
+                time.sleep(delay)
+
+    def _run(self, batch, futures):
+        """Embed a batch and resolve its futures"""
+
+        try:
+            vectors = self._request(batch)
+            for vec, future in zip(vectors, futures):
+                future.set_result(vec)
+        except Exception as e:
+            print(f"[Embedding error] text='{batch[:5]}…': {e}")
+            for future in futures:
+                future.set_exception(e)
+        finally:
+            with self._lock:
+                for term in batch:
+                    self._pending.pop(term, None)
+
+    def embed(self, terms: list[str]) -> dict:
+        """Return {term: unit vector} for every term that could be embedded"""
+
+        waiting = {}  # term => future (ours or another caller's)
+        to_send = []
+
+        with self._lock:
+            for term in dict.fromkeys(terms):  # Unique, order kept
+                future = self._pending.get(term)
+                if future is None:
+                    future = self._pending[term] = Future()
+                    to_send.append(term)
+                waiting[term] = future
+
+        # Send our terms as concurrent batches
+        for start in range(0, len(to_send), self.batch_size):
+            batch = to_send[start:start + self.batch_size]
+            self.pool.submit(self._run, batch, [waiting[t] for t in batch])
+
+        wait(waiting.values())
+        return {term: f.result() for term, f in waiting.items() if f.exception() is None}
+
+
+embedding_client = EmbeddingClient()
@@ -0,0 +1,371 @@
+import os
+import json
+import time
+import heapq
+import threading
+import numpy as np
+
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, one process per store
+    fcntl = None
+
+EVICT_TO = 0.9       # Evict down to this share of capacity, so eviction runs once per many adds
+SYNC_INTERVAL = 1.0  # Seconds between checks of the files for other processes' writes
+
+
+class EmbeddingStore:
+    """Append-only float32 embedding matrix on disk, memory-mapped for reads
+
+    Files:
+        <path>.f32   raw float32 rows, one vector per term
+        <path>.idx   one JSON-encoded term per line, line number = row
+        <path>.lock  flock'ed by writers, holds the compaction generation
+
+    Several processes (web app and worker) can share a store: appends and
+    compactions hold the lock, row numbers come from the files under it,
+    and each process catches up with the others' appends (or reloads after
+    their compaction) before it writes or remaps.
+
+    With a capacity, least recently (lru) or least frequently (lfu) used
+    terms are evicted, except pinned ones. Evicted rows stay in the files
+    until compact() rewrites them.
+    """
+
+    def __init__(self, path: str, dim: int = 768, capacity: int = 0, policy: str = "lru"):
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Unknown eviction policy: {policy}")
+
+        self.dim = dim
+        self.data_path = f"{path}.f32"
+        self.index_path = f"{path}.idx"
+        self.marker_path = f"{path}.compacting"
+        self.lock_path = f"{path}.lock"
+        self.capacity = capacity  # Live terms kept, 0 = unbounded
+        self.policy = policy
+        self._lock = threading.Lock()
+        self.index = {}  # term => row
+
+        # What this process has read of the files
+        self._terms = []         # Term of every index line read so far (line = row)
+        self._index_offset = 0   # Bytes of the index file read
+        self._rows = 0           # Rows mapped
+        self._generation = None  # Compaction generation the above belongs to
+        self._synced_at = 0.0
+
+        # Usage, for eviction
+        self.pinned = set()
+        self.last_used = {}  # term => tick of last get
+        self.uses = {}       # term => number of gets
+        self._tick = 0
+
+        # Counters, for tuning capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.compactions = 0
+
+        with self._lock, self._file_lock(exclusive=True) as lock:
+            self._recover()
+            self._sync(lock)
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """Lock shared by every process using the store (writers exclusive, readers shared)"""
+
+        if fcntl is None:
+            yield None
+            return
+        with open(self.lock_path, "a+", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield f
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read_generation(lock):
+        if lock is None:
+            return 0
+        lock.seek(0)
+        return int(lock.read().strip() or 0)
+
+    def _bump_generation(self, lock):
+        """Tell other processes their row numbers are void (files rewritten), the caller holds the lock"""
+
+        self._generation = self._read_generation(lock) + 1
+        if lock is not None:
+            lock.truncate(0)
+            lock.write(str(self._generation))
+            lock.flush()
+
+    def _recover(self):
+        """Finish a compaction interrupted between its two file swaps"""
+
+        if not os.path.exists(self.marker_path):
+            return
+        # Both temp files were complete before the marker was written, so roll forward
+        for path in (self.data_path, self.index_path):
+            if os.path.exists(f"{path}.tmp"):
+                os.replace(f"{path}.tmp", path)
+        os.remove(self.marker_path)
+
+    def _file_rows(self):
+        return os.path.getsize(self.data_path) // (self.dim * 4) if os.path.exists(self.data_path) else 0
+
+    def _sync(self, lock):
+        """Catch up with the files: reload after a compaction, else index rows appended since
+
+        The caller holds self._lock and the file lock.
+        """
+
+        generation = self._read_generation(lock)
+        reload = generation != self._generation
+        if reload:
+            self._terms, self._index_offset, self._rows = [], 0, 0
+            self.index = {}
+            self._generation = generation
+
+        # New complete lines only (a writer may have crashed mid-line)
+        if os.path.exists(self.index_path) and os.path.getsize(self.index_path) > self._index_offset:
+            with open(self.index_path, "rb") as f:
+                f.seek(self._index_offset)
+                complete = f.read().rpartition(b"\n")[0]
+            if complete:
+                self._terms.extend(json.loads(line) for line in complete.split(b"\n"))
+                self._index_offset += len(complete) + 1
+
+        # Ignore a half-written tail (e.g. crash between the two appends)
+        rows = min(self._file_rows(), len(self._terms))
+        if reload or rows > self._rows:
+            for row in range(self._rows, rows):
+                term = self._terms[row]
+                self.index[term] = row  # A term stored twice (re-added after eviction) => newest row
+                self._tick += 1
+                self.last_used.setdefault(term, self._tick)
+            self._rows = rows
+            self._map()
+        if reload:
+            self._forget([t for t in list(self.last_used) if t not in self.index])
+
+        self._synced_at = time.monotonic()
+
+    def _repair(self, lock):
+        """Cut both files back to the rows they both hold (crash between two appends), the caller holds the lock"""
+
+        data_size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        index_size = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        if data_size == self._rows * self.dim * 4 and index_size == self._index_offset \
+                and len(self._terms) == self._rows:
+            return
+
+        if data_size:
+            os.truncate(self.data_path, self._rows * self.dim * 4)
+        if index_size:
+            os.truncate(self.index_path, sum(len(json.dumps(t)) + 1 for t in self._terms[:self._rows]))
+
+        # Other processes may have read lines that are gone now
+        self._bump_generation(lock)
+        self._generation = None
+        self._sync(lock)
+
+    def _map(self):
+        """(Re)map the matrix file read-only"""
+
+        if self._rows == 0:
+            self.matrix = np.empty((0, self.dim), dtype=np.float32)
+        else:
+            self.matrix = np.memmap(self.data_path, dtype=np.float32, mode="r", shape=(self._rows, self.dim))
+
+    def __contains__(self, term):
+        return term in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def dead_rows(self):
+        """Rows still in the files but no longer indexed"""
+        return self._rows - len(self.index)
+
+    def get(self, term, touch: bool = True):
+        """Return a zero-copy view of the term's row, or None if not stored
+
+        touch=False reads without counting a hit/miss or a use (index rebuilds)
+        """
+
+        with self._lock:  # Index and matrix change together on compaction
+            row = self.index.get(term)
+            if not touch:
+                return None if row is None else self.matrix[row]
+
+            # Take in other processes' appends and compactions (at most every SYNC_INTERVAL)
+            if time.monotonic() - self._synced_at > SYNC_INTERVAL:
+                with self._file_lock(exclusive=False) as lock:
+                    self._sync(lock)
+                row = self.index.get(term)
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._tick += 1
+            self.last_used[term] = self._tick
+            self.uses[term] = self.uses.get(term, 0) + 1
+            return self.matrix[row]
+
+    def pin(self, terms):
+        """Never evict these terms (replaces the previous pinned set)"""
+
+        with self._lock:
+            self.pinned = set(terms)
+
+    def add(self, terms: list[str], vectors: np.ndarray):
+        """Append new vectors (only the new rows are written)"""
+
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+
+        with self._lock, self._file_lock(exclusive=True) as lock:
+            # Row numbers come from the files: first take in what other processes wrote
+            self._sync(lock)
+            self._repair(lock)
+
+            # Skip terms stored meanwhile or repeated within the call
+            fresh, rows, seen = [], [], set()
+            for term, vec in zip(terms, vectors):
+                if term in self.index or term in seen:
+                    continue
+                seen.add(term)
+                fresh.append(term)
+                rows.append(vec)
+
+            if not fresh:
+                return
+
+            # Vectors first so the index never points past the end of the matrix
+            lines = "".join(json.dumps(term) + "\n" for term in fresh).encode("utf-8")
+            with open(self.data_path, "ab") as f:
+                f.write(np.ascontiguousarray(rows, dtype=np.float32).tobytes())
+            with open(self.index_path, "ab") as f:
+                f.write(lines)
+
+            self._terms.extend(fresh)
+            self._index_offset += len(lines)
+            for term in fresh:
+                self.index[term] = self._rows
+                self._rows += 1
+                self._tick += 1
+                self.last_used[term] = self._tick  # New terms count as just used
+            self._map()  # Old views stay valid, they hold the previous map
+
+            if self.capacity and len(self.index) > self.capacity:
+                self._evict(len(self.index) - int(self.capacity * EVICT_TO), lock)
+
+    def _evict(self, count, lock):
+        """Drop `count` unpinned terms by policy, the caller holds the locks"""
+
+        if self.policy == "lfu":
+            key = lambda t: (self.uses.get(t, 0), self.last_used.get(t, 0))
+        else:
+            key = lambda t: self.last_used.get(t, 0)
+
+        victims = heapq.nsmallest(count, (t for t in self.index if t not in self.pinned), key=key)
+        self._forget(victims)
+        self.evictions += len(victims)
+
+        # Files at most twice the live size
+        if self.dead_rows > len(self.index):
+            self._compact(lock)
+
+    def _forget(self, terms):
+        for term in terms:
+            self.index.pop(term, None)
+            self.last_used.pop(term, None)
+            self.uses.pop(term, None)
+
+    def compact(self, live=None):
+        """Rewrite the files with only indexed rows, dropping terms not in `live` (pinned are kept)
+
+        Returns the number of terms dropped because they were not live.
+        """
+
+        with self._lock, self._file_lock(exclusive=True) as lock:
+            self._sync(lock)  # Terms other processes added are judged too
+            dropped = 0
+            if live is not None:
+                live = set(live) | self.pinned
+                dead = [t for t in self.index if t not in live]
+                self._forget(dead)
+                dropped = len(dead)
+            if self.dead_rows:
+                self._compact(lock)
+            return dropped
+
+    def _compact(self, lock):
+        """Write live rows to temp files and swap them in, the caller holds the locks"""
+
+        terms = sorted(self.index, key=self.index.get)  # Keep file order
+        rows = np.fromiter((self.index[t] for t in terms), dtype=np.int64, count=len(terms))
+
+        with open(f"{self.data_path}.tmp", "wb") as f:
+            for start in range(0, len(rows), 4096):  # Chunks, the matrix may not fit in memory
+                f.write(np.ascontiguousarray(self.matrix[rows[start:start + 4096]]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        lines = "".join(json.dumps(term) + "\n" for term in terms).encode("utf-8")
+        with open(f"{self.index_path}.tmp", "wb") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # The marker makes the two swaps recoverable as one (see _recover)
+        open(self.marker_path, "w").close()
+        os.replace(f"{self.data_path}.tmp", self.data_path)
+        os.replace(f"{self.index_path}.tmp", self.index_path)
+        os.remove(self.marker_path)
+        self._bump_generation(lock)  # Other processes reload before using row numbers again
+
+        self.index = {term: row for row, term in enumerate(terms)}
+        self._terms = terms
+        self._index_offset = len(lines)
+        self._rows = len(terms)
+        self._map()
+        self.compactions += 1
+
+    def stats(self):
+        """Counters for tuning capacity"""
+
+        lookups = self.hits + self.misses
+        return {
+            "terms": len(self.index),
+            "capacity": self.capacity,
+            "policy": self.policy,
+            "pinned": len(self.pinned),
+            "dead_rows": self.dead_rows,
+            "file_bytes": self._rows * self.dim * 4,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "compactions": self.compactions,
+        }
+
+    def migrate_json(self, json_path: str):
+        """One-shot import of the old JSON cache, renamed afterwards so it runs once"""
+
+        if not os.path.exists(json_path):
+            return 0
+
+        with open(json_path, "r") as f:
+            cache = json.load(f)
+
+        terms = [t for t, v in cache.items() if len(v) == self.dim]
+        if terms:
+            self.add(terms, np.array([cache[t] for t in terms], dtype=np.float32))
+
+        os.replace(json_path, f"{json_path}.migrated")
+        print(f"Migrated {len(terms)} embeddings from {json_path}")
+        return len(terms)
@@ -1,14 +1,24 @@
 import os
 import nltk
 import json
-import requests
+import metrics
+import threading
+import response_cache
+import partitions
 import xml.etree.ElementTree as ET
 
-from flask import current_app
-from newspaper import Article, Config
+from functools import partial
+from contextlib import closing
+from newspaper import Config
 from email.utils import parsedate_to_datetime
 from datetime import date, datetime, timedelta
-from helpers import get_db, normalize_text, get_sematic_matches
+from text_cache import store_texts
+from keyword_cache import KeywordExtractor
+from dedup import Fingerprints, canonical_url, title_words, simhash, bands
+from pipeline import Pipeline, Stage, HostLimiter
+from redirects import RedirectResolver, pooled_session
+from helpers import get_db, normalize_text, get_batch_semantic_matches, rescore_articles, embedding_store, \
+    FINGERPRINT_INSERT, close_thread_db
 
 from dotenv import load_dotenv
 load_dotenv()  # Always load first
@@ -16,6 +26,17 @@ load_dotenv()  # Always load first
 FUZZY_LIMIT = 60  # Fuzzy matching threshold (0–100)
 NEWSDATA_KEY = os.environ.get("NEWSDATA_KEY")
 
+# Ingestion pipeline sizing
+FEED_WORKERS = int(os.environ.get("FEED_WORKERS", 2))
+REDIRECT_WORKERS = int(os.environ.get("REDIRECT_WORKERS", 8))
+DOWNLOAD_WORKERS = int(os.environ.get("DOWNLOAD_WORKERS", 8))
+HOST_CONCURRENCY = int(os.environ.get("HOST_CONCURRENCY", 2))  # Max requests per host at once
+QUEUE_SIZE = 32    # Bounded queues between stages (backpressure)
+MATCH_BATCH = 16   # Articles matched per similarity matmul
+COMMIT_EVERY = 20  # Articles saved per bulk write (one transaction each)
+
+DOWNLOAD_SECONDS = metrics.histogram("download_seconds", "Time downloading article pages", server_timing="download")
+
 try:
     nltk.data.find('tokenizers/punkt')
 except LookupError:
@@ -23,6 +44,11 @@ except LookupError:
 
 config = Config()
 config.browser_user_agent = os.environ.get("USER_AGENT")
+
+host_limiter = HostLimiter(HOST_CONCURRENCY)  # Shared by every stage that hits the network
+http = pooled_session(REDIRECT_WORKERS + DOWNLOAD_WORKERS, config.browser_user_agent)  # Keep-alive connections
+redirect_resolver = RedirectResolver(http, get_db)  # Google News link => article url, remembered between runs
+keyword_extractor = KeywordExtractor(get_db, normalize_text)  # NLP on every core, results cached in the db
  
 # News Data has char limit for queries
 def batch_keywords(keywords: set, max_chars=100):
@@ -64,90 +90,229 @@ def batch_keywords(keywords: set, max_chars=100):
     if batch:
         yield batch  # Out of keywords
 
+class FeedState:
+    """Per-query watermarks and already ingested articles, loaded before a run and saved after"""
+
+    def __init__(self, db=None):
+        self._lock = threading.Lock()
+        self.watermarks = {}  # query key => {etag, last_modified, last_pub_date, last_guid}
+        self.updates = {}
+        self.outstanding = {} # query key => items of its response not yet saved (or found irrelevant)
+        self.known = {}       # article id => (article_url, stored terms)
+        self.terms = {}       # article id => keywords of this run's item for it, for its later copies
+        self.waiting = {}     # article id => copies that arrived before those keywords
+        self.skipped = 0      # Items that didn't need downloading
+        self.duplicates = 0   # Items folded into another item's article (a copy from another source or batch)
+        self.fingerprints = Fingerprints()
+
+        if db is None:
+            return
+
+        self.fingerprints = Fingerprints.load(db)
+
+        for row in db.execute("SELECT * FROM feed_watermarks"):
+            self.watermarks[row["query"]] = dict(row)
+
+        for row in db.execute("""
+            SELECT a.id, a.article_url, json_group_array(t.term) FILTER (WHERE t.term IS NOT NULL) AS terms
+            FROM articles a
+            LEFT JOIN article_terms t ON t.article_id = a.id
+            GROUP BY a.id
+        """):
+            self.known[row["id"]] = (row["article_url"], json.loads(row["terms"]))
+
+    def watermark(self, key):
+        return self.watermarks.get(key, {})
+
+    def conditional_headers(self, key):
+        """Validators from the last response for this query"""
+
+        mark = self.watermark(key)
+        headers = {}
+        if mark.get("etag"):
+            headers["If-None-Match"] = mark["etag"]
+        if mark.get("last_modified"):
+            headers["If-Modified-Since"] = mark["last_modified"]
+        return headers
+
+    def track(self, key, item):
+        """Count an item against its query, whose watermark waits until the item is done"""
+
+        item["feed_keys"] = [key]
+        with self._lock:
+            self.outstanding[key] = self.outstanding.get(key, 0) + 1
+        return item
+
+    def done(self, items):
+        """Items saved, or processed and matching nothing (a retry wouldn't change that)"""
+
+        with self._lock:
+            for item in items:
+                for key in item.get("feed_keys", []):
+                    self.outstanding[key] -= 1
+
+    def update(self, key, response, items):
+        """Remember validators and the newest item seen for this query"""
+
+        newest = max(items, key=lambda i: i["pub_time"], default=None)
+        mark = dict(self.watermark(key))
+        mark.update(
+            query=key,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"))
+        if newest and newest["pub_time"] > (mark.get("last_pub_date") or ""):
+            mark.update(last_pub_date=newest["pub_time"], last_guid=newest["id"])
+
+        with self._lock:
+            self.updates[key] = mark
+
+    def skip_known(self, item):
+        """Reuse stored keywords of already ingested articles instead of downloading again"""
+
+        known = self.known.get(item["id"])
+        if known:
+            item["article_url"], item["known_terms"] = known
+            with self._lock:
+                self.skipped += 1
+        return item
+
+    def dedupe(self, item):
+        """Give another source's copy of an article that article's id, so their batch keywords merge"""
+
+        item["canonical_url"] = canonical_url(item["article_url"])
+        item["title_hash"] = simhash(title_words(item["title"], item["source"]))
+
+        owner = self.fingerprints.claim(item["id"], item["canonical_url"], item["title_hash"])
+        if owner == item["id"]:
+            return item
+
+        item["id"] = owner
+        if owner in self.known:
+            # Stored under another id: merge this batch's keywords into it, no download
+            return self.skip_known(item)
+
+        # Claimed by another item of this run (maybe for another keyword batch): never downloaded
+        # or parsed again, it's matched against its own batch with that item's keywords
+        # (now, or once they're known, see release_copies). save_articles merges the two.
+        with self._lock:
+            self.duplicates += 1
+            terms = self.terms.get(owner)
+            if terms is None:
+                self.waiting.setdefault(owner, []).append(item)
+                return None
+        item["known_terms"] = terms
+        return item
+
+    def release_copies(self, item):
+        """Keywords of an item are known: later copies reuse them, return the copies that waited"""
+
+        with self._lock:
+            if not item.get("failed"):
+                self.terms[item["id"]] = item["keywords"]
+            return self.waiting.pop(item["id"], [])
+
+    def save(self, db):
+        """Store watermarks of queries whose items were all done, others are asked again next run"""
+
+        ready = [mark for key, mark in self.updates.items() if not self.outstanding.get(key)]
+        held = len(self.updates) - len(ready)
+        if held:
+            print(f"Kept the previous watermark of {held} queries with failed items")
+
+        db.executemany("""
+            INSERT INTO feed_watermarks (query, etag, last_modified, last_pub_date, last_guid, checked_at)
+            VALUES (:query, :etag, :last_modified, :last_pub_date, :last_guid, CURRENT_TIMESTAMP)
+            ON CONFLICT (query) DO UPDATE SET
+                etag = excluded.etag,
+                last_modified = excluded.last_modified,
+                last_pub_date = excluded.last_pub_date,
+                last_guid = excluded.last_guid,
+                checked_at = excluded.checked_at
+        """, [
+            {k: mark.get(k) for k in ("query", "etag", "last_modified", "last_pub_date", "last_guid")}
+            for mark in ready
+        ])
+
+
 # Limit the articles returned to keep it neat
-def fetch_google_tech_news(batch, max_articles=10):
-    """Fetch latest news from Google News"""
+def fetch_google_tech_news(batch, max_articles=10, state=None):
+    """Stream latest news items from Google News (feed stage), yielding each as soon as it's parsed"""
 
+    state = state or FeedState()
     queries = " OR ".join(batch)
     url = f"https://news.google.com/rss/search?q={queries}+topic:TECHNOLOGY&hl=en-US&gl=US&ceid=US:en" 
+    key = f"google:{queries}"
 
-    response = requests.get(url, timeout=10)
+    response = http.get(url, headers=state.conditional_headers(key), timeout=10, stream=True)
+    if response.status_code == 304:
+        response.close()
+        return  # Nothing new since last run
     response.raise_for_status()
 
-    articles = []
+    items = []
+    fresh = 0
     start_date = date.today() - timedelta(days=5)  # Last 5 days
 
-    # Parse XML and extract details
-    root = ET.fromstring(response.text)
-    channel = root.find("channel")
-
-    for item in channel.findall("item")[:max_articles]:    
-        # Parse date, skip if fails
-        pub_date_str = item.findtext("pubDate")
-        try:
-            pub_date = parsedate_to_datetime(pub_date_str).date()
-        except ValueError:
-            continue  # Can't filter by date
-        
-        # Skip if older than 5 days ago
-        if pub_date < start_date:
-            continue
-
-        # Extract basic info
-        id = item.findtext("guid", "")
-        link = item.findtext("link", "")
-        source = item.findtext("source", "Google News")
-        title = item.findtext("title")
-
-        # Resolve Google News redirect
-        if "news.google.com/rss/articles/" in link:
-            try:
-                response = requests.get(link, allow_redirects=True, timeout=5)
-                link = response.url  # This is the real article URL
-            except Exception as e:
-                print(f"Failed to resolve Google redirect: {link} -> {e}")
+    try:
+        # Parse XML incrementally from the socket, one <item> at a time
+        response.raw.decode_content = True  # Undo gzip
+        for _, item in ET.iterparse(response.raw, events=("end",)):
+            if item.tag != "item":
                 continue
 
-        # Keyword matching
-        filtered = set()
-        try:
-            # Parse content inside url
-            article = Article(link, config=config)
-            article.download()
-            article.parse()
-            article.nlp()
-            keywords = [normalize_text(str(k)) for k in article.keywords if k]
-
-        except Exception as e:
-            print(f"Failed to extract: {link} -> {e}")
-            keywords = []  # Return empty list
-
-        filtered.update(get_sematic_matches(batch, keywords))
-        
-        # Ensure required info exists
-        if id and link and filtered and title:
-            articles.append({
-                "id": id,
-                "article_url": link,
-                "source": source,
-                "pub_date": pub_date,
-                "keywords": filtered,
-                "title": title
-            })
-
-    return articles
+            # Parse date, skip if fails
+            pub_date_str = item.findtext("pubDate")
+            try:
+                pub_time = parsedate_to_datetime(pub_date_str)
+                pub_date = pub_time.date()
+            except (TypeError, ValueError):
+                pub_date = None  # Can't filter by date
+            
+            # Skip if unknown date or older than 5 days ago
+            if pub_date and pub_date >= start_date:
+                # Extract basic info (downloading is left to later stages)
+                parsed = state.track(key, state.skip_known({
+                    "id": item.findtext("guid", ""),
+                    "article_url": item.findtext("link", ""),
+                    "source": item.findtext("source", "Google News"),
+                    "pub_date": pub_date,
+                    "pub_time": pub_time.isoformat(),
+                    "title": item.findtext("title"),
+                    "feed_keywords": [],
+                    "known_terms": None,
+                    "batch": batch
+                }))
+                items.append(parsed)
+                yield parsed  # Straight on to the next stage
+
+                # Only new articles count towards the limit
+                if parsed["known_terms"] is None:
+                    fresh += 1
+
+            item.clear()  # Free parsed elements as we go
+            if fresh >= max_articles:
+                break  # Stop reading the rest of the feed
+    finally:
+        response.close()
+
+    state.update(key, response, items)
 
 
 # max 10 articles per request for free tier
-def fetch_from_newsdata(batch):
-    """Fetch latest news from NewsData.io"""
+def fetch_from_newsdata(batch, state=None):
+    """Fetch latest news items from NewsData.io (feed stage)"""
 
+    state = state or FeedState()
     queries = " OR ".join(batch)
     url = "https://newsdata.io/api/1/latest"
-    articles = []
+    key = f"newsdata:{queries}"
+    items = []
     
     start_date = date.today() - timedelta(days=5)  # Last 5 days
 
+    # Results come oldest first, anything older than the newest seen was in an earlier response
+    seen_until = state.watermark(key).get("last_pub_date") or ""
+
     params = {
         "apikey": NEWSDATA_KEY,
         "q": queries,
@@ -155,7 +320,9 @@ def fetch_from_newsdata(batch):
         "language": "en",
         "sort": "pubdateasc"
     }     
-    response = requests.get(url, params=params, timeout=10)
+    response = http.get(url, params=params, headers=state.conditional_headers(key), timeout=10)
+    if response.status_code == 304:
+        return []  # Nothing new since last run
     response.raise_for_status()  
     data = response.json()       
 
@@ -177,70 +344,304 @@ def fetch_from_newsdata(batch):
             continue
         try:
             # Remove time from published date
-            pub_date = datetime.fromisoformat(pub_date_str).date()
+            pub_time = datetime.fromisoformat(pub_date_str)
+            pub_date = pub_time.date()
         except ValueError:
             continue  # Can't filter by date
 
-        # Skip if older than 5 days ago
-        if pub_date < start_date:
+        # Skip if older than 5 days ago or already seen for this query
+        if pub_date < start_date or pub_time.isoformat() < seen_until:
             continue
 
-        # Extract basic info
-        id = r.get("article_id")
-        link = r.get("link")
-        source = r.get("source_id")
-        title = r.get("title")
-
         # Normalize keywords from article if any
         keys = r.get("keywords") or []
         clean_keys = [normalize_text(str(k)) for k in keys if k]
 
-        # Keyword matching
-        filtered = set()
+        # Extract basic info (downloading is left to later stages)
+        items.append(state.track(key, state.skip_known({
+            "id": r.get("article_id"),
+            "article_url": r.get("link"),
+            "source": r.get("source_id"),
+            "pub_date": pub_date,
+            "pub_time": pub_time.isoformat(),
+            "title": r.get("title"),
+            "feed_keywords": clean_keys,
+            "known_terms": None,
+            "batch": batch
+        })))
+
+    state.update(key, response, items)
+    return items
+
+
+def fetch_feed(batch, state=None):
+    """Stream feed items for a batch from Google News or fallback to NewsData.io"""
+
+    yielded = False
+    try:
+        for item in fetch_google_tech_news(batch, state=state):
+            yielded = True
+            yield item
+    except Exception as e:
+        print(f"Google News fetch failed: {e}")
+        # Items already passed on would be duplicated by the fallback
+        if yielded:
+            return
         try:
-            # Parse content inside url
-            article = Article(link, config=config)
-            article.download()
-            article.parse()
-            article.nlp()
-            keywords = [normalize_text(str(k)) for k in article.keywords if k]
+            yield from fetch_from_newsdata(batch, state=state)
         except Exception as e:
-            print(f"Failed to extract: {link} -> {e}")
-            keywords = []  # Return empty list
-
-        all_keys = keywords + clean_keys  # Combine 2 lists
-        filtered.update(get_sematic_matches(batch, all_keys))
-
-        # Ensure required info exists
-        if id and link and filtered and title:
-            articles.append({
-                "id": id,
-                "article_url": link,
-                "source": source,
-                "pub_date": pub_date,
+            print(f"NewsData.io fetch failed: {e}")
+            return  # Move onto next batch
+
+
+def resolve_redirect(item):
+    """Replace Google News redirect links with the real article URL"""
+
+    link = item["article_url"]
+    if item["known_terms"] is not None or "news.google.com/rss/articles/" not in link:
+        return item
+
+    try:
+        # Only headers are fetched, the article page itself is downloaded once, later
+        with host_limiter.limit(link):
+            item["article_url"] = redirect_resolver.resolve(link)  # This is the real article URL
+        return item
+    except Exception as e:
+        print(f"Failed to resolve Google redirect: {link} -> {e}")
+        return None  # Drop item
+
+
+def download_article(item):
+    """Download the article html, unless its keywords are already known"""
+
+    link = item["article_url"]
+    item.update(html=None, text=None, etag=None, last_modified=None, keywords=None)
+
+    # Already ingested, keywords are stored
+    if item["known_terms"] is not None:
+        item["keywords"] = item["known_terms"]
+        return item
+
+    # Processed before (e.g. an article no batch matched), no need to download or parse
+    cached = keyword_extractor.cached_keywords(link)
+    if cached is not None:
+        item["keywords"] = cached
+        return item
+
+    try:
+        # Download ourselves to keep the validators for the text cache
+        with host_limiter.limit(link):
+            with DOWNLOAD_SECONDS.time(source="ingest", result="error") as labels:
+                response = http.get(link, timeout=10)
+                response.raise_for_status()
+                labels["result"] = "ok"
+        item.update(
+            html=response.text,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"))
+
+    except Exception as e:
+        print(f"Failed to download: {link} -> {e}")
+        item["keywords"] = []
+        item["failed"] = True  # Not done: its query is asked again next run
+
+    return item
+
+
+def extract_keywords(item):
+    """Parse and run NLP on downloaded html (in the process pool) to get the article's keywords"""
+
+    html = item.pop("html")
+    if item["keywords"] is None:
+        text, keywords = keyword_extractor.extract(item["article_url"], html)
+        item.update(text=text, keywords=keywords)  # Text kept for /extract-article
+
+    item["keywords"] = item["keywords"] + item["feed_keywords"]  # Combine 2 lists
+    return item
+
+
+def match_keywords(items, state=None):
+    """Keep the batch keywords each article semantically matches (many articles at once)"""
+
+    # Copies from other feeds or batches that waited in dedupe: same keywords, their own batch
+    if state:
+        items = items + [
+            dict(item, batch=copy["batch"], feed_keys=copy["feed_keys"],
+                 keywords=item["keywords"] + copy["feed_keywords"])
+            for item in items for copy in state.release_copies(item)
+        ]
+
+    # Group articles by the keyword batch they were fetched for
+    groups = {}
+    for item in items:
+        groups.setdefault(tuple(item["batch"]), []).append(item)
+
+    matched = []
+    for batch, group in groups.items():
+        all_matches = get_batch_semantic_matches(list(batch), [item["keywords"] for item in group])
+
+        for item, matches in zip(group, all_matches):
+            filtered = set(matches)
+
+            # Ensure required info exists
+            if not (item["id"] and item["article_url"] and filtered and item["title"]):
+                if state and not item.get("failed"):
+                    state.done([item])  # Irrelevant, no need to see it again
+                continue
+
+            matched.append({
+                "id": item["id"],
+                "article_url": item["article_url"],
+                "source": item["source"],
+                "pub_date": item["pub_date"],
                 "keywords": filtered,
-                "title": title
+                "terms": item["keywords"],
+                "title": item["title"],
+                "canonical_url": item.get("canonical_url"),
+                "title_hash": item.get("title_hash"),
+                "text": item["text"],
+                "etag": item["etag"],
+                "last_modified": item["last_modified"],
+                "feed_keys": item.get("feed_keys", []),
+                "failed": item.get("failed", False)
             })
 
-    return articles
+    return matched
+
+
+def build_pipeline(state):
+    """Stages for ingestion, each with its own worker pool"""
+
+    return Pipeline([
+        Stage("feed", partial(fetch_feed, state=state), workers=FEED_WORKERS, queue_size=QUEUE_SIZE, fan_out=True),
+        Stage("redirect", resolve_redirect, workers=REDIRECT_WORKERS, queue_size=QUEUE_SIZE),
+        # Checked before downloading, so a story listed by both feeds (or for two batches) is fetched once
+        Stage("dedup", state.dedupe, workers=1, queue_size=QUEUE_SIZE),
+        Stage("download", download_article, workers=DOWNLOAD_WORKERS, queue_size=QUEUE_SIZE),
+        # Threads only wait here, parsing runs in the extractor's process pool
+        Stage("nlp", extract_keywords, workers=keyword_extractor.processes, queue_size=QUEUE_SIZE),
+        # Embedding cache is shared and saved to file, keep it single-threaded.
+        # Articles are matched in groups so each keyword is embedded once per group.
+        Stage("match", partial(match_keywords, state=state), workers=1, queue_size=QUEUE_SIZE,
+              batch_size=MATCH_BATCH),
+    ], queue_size=QUEUE_SIZE, on_thread_exit=close_thread_db)  # Stage threads last one run
+
+
+def save_articles(db, articles: list[dict]):
+    """Insert unique articles and merge relevant keywords for a whole batch in one transaction"""
+
+    if not articles:
+        return
+
+    remap_duplicates(db, articles)
+    texts = [
+        (a["article_url"], a["id"], a["text"], a["etag"], a["last_modified"])
+        for a in articles if a.get("text")
+    ]
+    articles = merge_copies(articles)
+
+    rows = [(a["id"], a["article_url"], a["source"], str(a["pub_date"]), json.dumps(sorted(a["keywords"])), a["title"])
+            for a in articles]
+
+    with db:  # Single transaction, committed on success
+        if partitions.enabled():
+            save_partitioned(db, rows)
+        else:
+            # Keywords of an existing article are merged (as a set) in SQL
+            db.executemany("""
+                INSERT INTO articles (id, article_url, source, pub_date, keywords, title)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET keywords = (
+                    SELECT json_group_array(value) FROM (
+                        SELECT value FROM json_each(articles.keywords)
+                        UNION
+                        SELECT value FROM json_each(excluded.keywords)
+                    )
+                )""", rows)
+
+        # Canonical url and title fingerprint, for dedup on later runs
+        db.executemany(FINGERPRINT_INSERT, [
+            (a["id"], a["canonical_url"], a["title_hash"],
+             *(bands(a["title_hash"]) if a["title_hash"] is not None else [None] * 4))
+            for a in articles
+        ])
+
+        # Keep keyword index and per-user relevance in sync
+        db.executemany(
+            "INSERT OR IGNORE INTO article_keywords (article_id, keyword) VALUES (?, ?)",
+            [(a["id"], k) for a in articles for k in a["keywords"]])
+        db.executemany(
+            "INSERT OR IGNORE INTO article_terms (article_id, term) VALUES (?, ?)",
+            [(a["id"], t) for a in articles for t in a.get("terms", []) if t])
+        rescore_articles(db, {a["id"] for a in articles})
+
+        # Text for /extract-article
+        store_texts(db, texts)
+
+        response_cache.bump(db, response_cache.ARTICLES)  # Dashboards show the new articles
+
+
+def remap_duplicates(db, articles: list[dict]):
+    """Give articles whose canonical url is already stored (or earlier in the list) that article's id"""
+
+    for a in articles:
+        if not a.get("canonical_url"):
+            a["canonical_url"] = canonical_url(a["article_url"])
+        if a.get("title_hash") is None:
+            a["title_hash"] = simhash(title_words(a["title"], a["source"]))
+
+    owners = {row["canonical_url"]: row["article_id"] for row in db.execute(
+        "SELECT canonical_url, article_id FROM article_fingerprints WHERE canonical_url IN (SELECT value FROM json_each(?))",
+        (json.dumps([a["canonical_url"] for a in articles]),))}
+
+    for a in articles:
+        a["id"] = owners.setdefault(a["canonical_url"], a["id"])
+
+
+def merge_copies(articles: list[dict]):
+    """One entry per id, copies' keywords and terms merged into the first (a multi-row upsert can't merge them)"""
+
+    merged = {}
+    for a in articles:
+        first = merged.setdefault(a["id"], a)
+        if first is not a:
+            first["keywords"] = set(first["keywords"]) | set(a["keywords"])
+            first["terms"] = list(dict.fromkeys(list(first.get("terms", [])) + list(a.get("terms", []))))
+    return list(merged.values())
+
+
+def save_partitioned(db, rows):
+    """Upsert for per-day partitions: merge into whichever day holds the article, else add to today's"""
+
+    # A view can't be an upsert target, the view's update trigger finds the partition
+    db.executemany("""
+        UPDATE articles SET keywords = (
+            SELECT json_group_array(value) FROM (
+                SELECT value FROM json_each(articles.keywords)
+                UNION
+                SELECT value FROM json_each(?)
+            )
+        )
+        WHERE id = ?""", [(r[4], r[0]) for r in rows])
+
+    table = partitions.ensure_partition(db, partitions.today())
+    db.executemany(f"""
+        INSERT INTO {table} (id, article_url, source, pub_date, keywords, title)
+        SELECT ?, ?, ?, ?, ?, ?
+        WHERE NOT EXISTS (SELECT 1 FROM articles WHERE id = ?1)""", rows)
 
 
 def save_article(db, article_id, article_url, source, date, keywords: set, title):
     """Insert unique articles and update relevant keywords"""
 
-    existing = db.execute("SELECT keywords FROM articles WHERE id = ?", (article_id,)).fetchone()
-    if existing:
-        # Merge old and new keywords
-        old_keywords = set(json.loads(existing["keywords"])) if existing["keywords"] else set()
-        merged = list(old_keywords.union(keywords))
-        # Update db
-        db.execute("UPDATE articles SET keywords = ? WHERE id = ?", (json.dumps(merged), article_id))
-    else:
-        # Insert article into db
-        db.execute("""
-            INSERT OR IGNORE INTO articles (id, article_url, source, pub_date, keywords, title)
-            VALUES (?, ?, ?, ?)""",
-            (article_id, article_url, source, date, json.dumps(list(keywords))), title)
+    save_articles(db, [{
+        "id": article_id,
+        "article_url": article_url,
+        "source": source,
+        "pub_date": date,
+        "keywords": keywords,
+        "title": title
+    }])
 
 
 def fetch_tech_articles():
@@ -259,28 +660,36 @@ def fetch_tech_articles():
         except (TypeError, json.JSONDecodeError):
             continue  # Move onto next list
 
-    if all_keywords:
-        for batch in batch_keywords(all_keywords):
-            # Fetch from Google News or fallback to NewsData.io
-            try:
-                articles = fetch_google_tech_news(batch)
-            except Exception as e:
-                current_app.logger.warning(f"Google News fetch failed: {e}")
-                try:
-                    articles = fetch_from_newsdata(batch)
-                except Exception as e:
-                    current_app.logger.warning(f"NewsData.io fetch failed: {e}")
-                    continue  # Move onto next batch
-            
-            # Ensure articles exist
-            if not articles:
-                continue 
-
-            # Ensure no duplicate articles
-            for a in articles:
-                save_article(db, a["id"], a["article_url"], a["source"], a["pub_date"], a["keywords"], a["title"])
+    if not all_keywords:
+        return None
+
+    embedding_store.pin(all_keywords)  # Matched every batch, never evicted
+    state = FeedState(db)
+    pipeline = build_pipeline(state)
+    pending = []
+
+    # Articles arrive as soon as they pass every stage.
+    # Keywords are sorted so batches (and their watermark keys) are stable between runs.
+    # closing(): if saving fails the run is cancelled, no stage threads are left blocked
+    with closing(pipeline.run(batch_keywords(sorted(all_keywords)))) as results:
+        for a in results:
+            pending.append(a)
+            if len(pending) >= COMMIT_EVERY:
+                save_articles(db, pending)  # Ensure data is saved along the way
+                state.done([a for a in pending if not a["failed"]])
+                pending = []
+
+    save_articles(db, pending)
+    state.done([a for a in pending if not a["failed"]])
+    state.save(db)
+    db.commit()
+    print(pipeline.report)
+    print(f"Skipped download of {state.skipped} already ingested articles")
+    print(f"Redirects: {redirect_resolver.requests} resolved, {redirect_resolver.cached} from cache")
+    print(f"Keyword extraction: {keyword_extractor.parsed} parsed, {keyword_extractor.cached} from cache")
+    print(f"Embedding cache: {embedding_store.stats()}")
+    return pipeline.report
 
-        db.commit()  # Ensure data is saved in between batches
 
 if __name__ == "__main__":
-    fetch_tech_articles()
\ No newline at end of file
+    fetch_tech_articles()
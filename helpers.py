@@ -2,38 +2,35 @@ import os
 import re
 import json
 import sqlite3
+import threading
+import metrics
+import response_cache
 import numpy as np
 import unicodedata
-import time, random
 
-from google import genai
 from functools import wraps
-from google.genai import types
-from flask import redirect, session, g, current_app
+from flask import redirect, session, g, current_app, has_app_context
+from embedding_store import EmbeddingStore
+from ann_index import IVFIndex
+from partitions import init_partitions
+from dedup import canonical_url, title_words, simhash, bands
+from embedding_client import embedding_client, EMBEDDING_DIM
 from sklearn.metrics.pairwise import cosine_similarity
 
 from dotenv import load_dotenv
 load_dotenv()  # Always load first
 
-# Initialize Client
-client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
+# Cache to minimize Gemini api calls (memory-mapped, rows are read on demand)
+CACHE_FILE = "embedding_cache.json"  # Old JSON cache, migrated once
+STORE_PATH = "embedding_store"
+CACHE_CAPACITY = int(os.environ.get("EMBEDDING_CACHE_CAPACITY", 200000))  # Live terms, 0 = unbounded
+CACHE_POLICY = os.environ.get("EMBEDDING_CACHE_POLICY", "lru")            # "lru" or "lfu"
 
-# Cache to minimize Gemini api calls
-CACHE_FILE = "embedding_cache.json"
+embedding_store = EmbeddingStore(STORE_PATH, dim=EMBEDDING_DIM, capacity=CACHE_CAPACITY, policy=CACHE_POLICY)
+embedding_store.migrate_json(CACHE_FILE)
 
-# Load cache from file if exists
-if os.path.exists(CACHE_FILE):
-    with open(CACHE_FILE, "r") as f:
-        embedding_cache = json.load(f)
-else:
-    embedding_cache = {}
-
-
-def save_cache():
-    """Save the embedding cache to file."""
-
-    with open(CACHE_FILE, "w") as f:
-        json.dump(embedding_cache, f, indent=4)  # Pretty print
+# ANN index over every stored article keyword (filled lazily from article_terms)
+keyword_index = IVFIndex(dim=EMBEDDING_DIM)
 
 
 # https://flask.palletsprojects.com/en/latest/patterns/viewdecorators/
@@ -49,26 +46,371 @@ def login_required(f):
     return decorated_function
 
 
+# Tables derived from articles/preferences (created on first connection)
+SCHEMA = """
+    CREATE INDEX IF NOT EXISTS idx_preferences_user ON preferences(user_id);
+
+    CREATE TABLE IF NOT EXISTS article_keywords (
+        article_id TEXT NOT NULL,
+        keyword TEXT NOT NULL,
+        PRIMARY KEY (article_id, keyword),
+        FOREIGN KEY (article_id) REFERENCES articles(id) ON DELETE CASCADE
+    );
+    CREATE INDEX IF NOT EXISTS idx_article_keywords_keyword ON article_keywords(keyword);
+
+    CREATE TABLE IF NOT EXISTS user_relevance (
+        user_id INTEGER NOT NULL,
+        article_id TEXT NOT NULL,
+        score INTEGER NOT NULL,
+        PRIMARY KEY (user_id, article_id),
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+        FOREIGN KEY (article_id) REFERENCES articles(id) ON DELETE CASCADE
+    );
+    CREATE INDEX IF NOT EXISTS idx_user_relevance_article ON user_relevance(article_id);
+
+    CREATE TABLE IF NOT EXISTS article_terms (
+        article_id TEXT NOT NULL,
+        term TEXT NOT NULL,
+        PRIMARY KEY (article_id, term),
+        FOREIGN KEY (article_id) REFERENCES articles(id) ON DELETE CASCADE
+    );
+    CREATE INDEX IF NOT EXISTS idx_article_terms_term ON article_terms(term);
+
+    CREATE TABLE IF NOT EXISTS article_texts (
+        url TEXT PRIMARY KEY,
+        article_id TEXT,
+        body BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        etag TEXT,
+        last_modified TEXT,
+        stored_at REAL NOT NULL,
+        accessed_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_article_texts_article ON article_texts(article_id);
+    CREATE INDEX IF NOT EXISTS idx_article_texts_accessed ON article_texts(accessed_at);
+
+    CREATE TABLE IF NOT EXISTS keyword_cache (
+        url TEXT PRIMARY KEY,
+        content_hash TEXT,
+        keywords TEXT NOT NULL,
+        processed_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_keyword_cache_hash ON keyword_cache(content_hash);
+    CREATE INDEX IF NOT EXISTS idx_keyword_cache_processed ON keyword_cache(processed_at);
+
+    CREATE TABLE IF NOT EXISTS article_fingerprints (
+        article_id TEXT PRIMARY KEY,
+        canonical_url TEXT UNIQUE,
+        simhash INTEGER,
+        band0 INTEGER,
+        band1 INTEGER,
+        band2 INTEGER,
+        band3 INTEGER,
+        FOREIGN KEY (article_id) REFERENCES articles(id) ON DELETE CASCADE
+    );
+    CREATE INDEX IF NOT EXISTS idx_article_fingerprints_band0 ON article_fingerprints(band0);
+    CREATE INDEX IF NOT EXISTS idx_article_fingerprints_band1 ON article_fingerprints(band1);
+    CREATE INDEX IF NOT EXISTS idx_article_fingerprints_band2 ON article_fingerprints(band2);
+    CREATE INDEX IF NOT EXISTS idx_article_fingerprints_band3 ON article_fingerprints(band3);
+
+    CREATE TABLE IF NOT EXISTS redirects (
+        url TEXT PRIMARY KEY,
+        target TEXT NOT NULL,
+        resolved_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_redirects_resolved ON redirects(resolved_at);
+
+    CREATE TABLE IF NOT EXISTS sessions (
+        id TEXT PRIMARY KEY,
+        data TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at);
+
+    CREATE TABLE IF NOT EXISTS cache_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS feed_watermarks (
+        query TEXT PRIMARY KEY,
+        etag TEXT,
+        last_modified TEXT,
+        last_pub_date TEXT,
+        last_guid TEXT,
+        checked_at TEXT
+    );
+"""
+
+# Every (user, preference keyword) pair, from the JSON lists in preferences
+USER_KEYWORDS = """
+    SELECT DISTINCT p.user_id, k.value AS keyword
+    FROM preferences p, json_each(p.keywords) k
+"""
+
+_schema_ready = set()  # Database files already set up by this process
+
+
+def init_schema(db):
+    """Create derived tables once per process and database, and backfill them if new"""
+
+    path = db.execute("PRAGMA database_list").fetchone()[2]  # "" for in-memory/temp databases
+    if path in _schema_ready:
+        return
+
+    is_new = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'article_keywords'").fetchone() is None
+    no_fingerprints = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'article_fingerprints'").fetchone() is None
+    db.executescript(SCHEMA)
+    init_partitions(db)  # Single articles table or per-day partitions, see partitions.py
+
+    if no_fingerprints:
+        backfill_fingerprints(db)
+
+    if is_new:
+        # Index keywords of articles stored before this table existed
+        db.execute("""
+            INSERT OR IGNORE INTO article_keywords (article_id, keyword)
+            SELECT a.id, k.value FROM articles a, json_each(a.keywords) k
+        """)
+        for row in db.execute("SELECT id FROM users").fetchall():
+            refresh_user_relevance(db, row["id"])
+        db.commit()
+
+    if path:
+        _schema_ready.add(path)
+
+
+FINGERPRINT_INSERT = """
+    INSERT OR IGNORE INTO article_fingerprints (article_id, canonical_url, simhash, band0, band1, band2, band3)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def backfill_fingerprints(db):
+    """Fingerprint stored articles, merging later copies of an already stored url into the first"""
+
+    rows, copies, seen = [], [], {}  # copies: (copy id, kept id), seen: canonical url => kept id
+    for row in db.execute("SELECT id, article_url, source, title FROM articles ORDER BY fetched_at, id").fetchall():
+        url = canonical_url(row["article_url"])
+        if url in seen:
+            copies.append((row["id"], seen[url]))
+            continue
+        seen[url] = row["id"]
+        value = simhash(title_words(row["title"], row["source"]))
+        rows.append((row["id"], url, value, *(bands(value) if value is not None else [None] * 4)))
+
+    with db:
+        db.executemany(FINGERPRINT_INSERT, rows)
+        if copies:
+            merge_articles(db, copies)
+    if copies:
+        print(f"Merged {len(copies)} duplicate articles")
+
+
+def merge_articles(db, copies: list[tuple[str, str]]):
+    """Fold each (copy id, kept id) pair: keywords, terms, summary and text go to the kept article, the copy is deleted"""
+
+    pairs = json.dumps(copies)
+    db.execute("""
+        UPDATE articles SET
+            keywords = (
+                SELECT json_group_array(DISTINCT value) FROM (
+                    SELECT value FROM json_each(articles.keywords)
+                    UNION
+                    SELECT k.value FROM json_each(?1) p
+                    JOIN articles c ON c.id = json_extract(p.value, '$[0]'), json_each(c.keywords) k
+                    WHERE json_extract(p.value, '$[1]') = articles.id
+                )
+            ),
+            summary = COALESCE(summary, (
+                SELECT c.summary FROM json_each(?1) p
+                JOIN articles c ON c.id = json_extract(p.value, '$[0]')
+                WHERE json_extract(p.value, '$[1]') = articles.id AND c.summary IS NOT NULL
+                LIMIT 1
+            ))
+        WHERE id IN (SELECT json_extract(value, '$[1]') FROM json_each(?1))
+    """, (pairs,))
+    for table, column in (("article_keywords", "keyword"), ("article_terms", "term")):
+        db.execute(f"""
+            INSERT OR IGNORE INTO {table} (article_id, {column})
+            SELECT json_extract(p.value, '$[1]'), t.{column}
+            FROM json_each(?) p JOIN {table} t ON t.article_id = json_extract(p.value, '$[0]')
+        """, (pairs,))
+
+    # Texts are keyed by url, the copy's stays available for its link
+    db.execute("""
+        UPDATE article_texts SET article_id = (
+            SELECT json_extract(p.value, '$[1]') FROM json_each(?1) p WHERE json_extract(p.value, '$[0]') = article_id
+        )
+        WHERE article_id IN (SELECT json_extract(value, '$[0]') FROM json_each(?1))
+    """, (pairs,))
+
+    rescore_articles(db, {kept for _, kept in copies})
+    delete_article_rows(db, [copy for copy, _ in copies])
+
+
+# Connection tuning: WAL lets readers (dashboard) and the writer (fetcher/cleaner) run together
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA busy_timeout = 5000",     # Wait (ms) on a locked db instead of failing
+    "PRAGMA synchronous = NORMAL",    # Safe with WAL, fewer fsyncs
+    "PRAGMA cache_size = -16000",     # 16 MB page cache per connection
+    "PRAGMA mmap_size = 134217728",   # Read pages through a 128 MB memory map
+    "PRAGMA temp_store = MEMORY",
+)
+STATEMENT_CACHE = 64  # Prepared statements kept per connection (hot queries are fixed strings)
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 8))  # Idle connections kept per database for requests
+
+_local = threading.local()  # One connection per long-lived thread (scripts, worker jobs)
+
+# Used when there is no Flask app (fetcher, cleaner and worker processes), TECHNUS_DB overrides it (benchmarks)
+DB_PATH = os.environ.get("TECHNUS_DB") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "technus.db")
+
+
+SQL_SECONDS = metrics.histogram(
+    "sql_seconds", "Time executing SQL statements (up to the first row)", server_timing="sql")
+SQL_KINDS = {"select", "with", "insert", "update", "delete", "pragma", "create", "drop", "alter"}
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that times its statements like TimedConnection (db.cursor().execute(...) callers)"""
+
+    def execute(self, sql, *args):
+        with SQL_SECONDS.time(kind=sql_kind(sql)):
+            return super().execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        with SQL_SECONDS.time(kind=sql_kind(sql)):
+            return super().executemany(sql, *args)
+
+    def executescript(self, sql):
+        with SQL_SECONDS.time(kind="script"):
+            return super().executescript(sql)
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection that times every statement by kind (select, insert, ...), its cursors' too"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, *args):
+        with SQL_SECONDS.time(kind=sql_kind(sql)):
+            return super().execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        with SQL_SECONDS.time(kind=sql_kind(sql)):
+            return super().executemany(sql, *args)
+
+    def executescript(self, sql):
+        with SQL_SECONDS.time(kind="script"):
+            return super().executescript(sql)
+
+
+def sql_kind(sql):
+    word = sql.lstrip().split(None, 1)[0].lower() if sql.strip() else ""
+    return word if word in SQL_KINDS else "other"
+
+
+def connect(db_path):
+    """Open a tuned connection"""
+
+    # Pooled connections move between request threads (one request at a time)
+    db = sqlite3.connect(db_path, timeout=5, cached_statements=STATEMENT_CACHE, factory=TimedConnection,
+                         check_same_thread=False)
+    db.row_factory = sqlite3.Row  # Enable access via column names like CS50 SQL
+    for pragma in PRAGMAS:
+        db.execute(pragma)
+    init_schema(db)
+    return db
+
+
+def thread_db(db_path=DB_PATH):
+    """This thread's connection to db_path, created on first use"""
+
+    connections = _local.__dict__.setdefault("connections", {})
+    if db_path not in connections:
+        connections[db_path] = connect(db_path)
+    return connections[db_path]
+
+
+def close_thread_db():
+    """Close this thread's connections (call before a short-lived thread ends)"""
+
+    for db in _local.__dict__.pop("connections", {}).values():
+        db.close()
+
+
+class ConnectionPool:
+    """Connections lent to requests and given back at teardown
+
+    Request threads come and go (a new one per request under the threaded
+    dev server), so connections and their statement caches live here
+    instead of in the thread. At most `size` idle ones are kept.
+    """
+
+    def __init__(self, db_path, size=POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._lock = threading.Lock()
+        self._idle = []
+        self.opened = 0
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()  # Most recently used: warmest caches
+            self.opened += 1
+        return connect(self.db_path)
+
+    def release(self, db):
+        # Never leave a transaction (and its locks) open between requests
+        if db.in_transaction:
+            db.rollback()
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(db)
+                return
+        db.close()  # More requests at once than the pool keeps
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool(db_path):
+    """The request connection pool of db_path"""
+
+    with _pools_lock:
+        if db_path not in _pools:
+            _pools[db_path] = ConnectionPool(db_path)
+        return _pools[db_path]
+
+
 # https://flask.palletsprojects.com/en/latest/patterns/sqlite3/
 def get_db():
-    """Store db connection for current request in Flask's g"""
+    """Store db connection for current request in Flask's g (or the thread's, outside Flask)"""
+
+    # Scripts and the worker have no app context
+    if not has_app_context():
+        return thread_db()
 
-    # Creat connection if none
+    # Borrow a pooled connection for the request, given back by close_db
     if "db" not in g:
-        db_path = os.path.join(current_app.root_path, "technus.db")
-        g.db = sqlite3.connect(db_path)
-        g.db.row_factory = sqlite3.Row  # Enable access via column names like CS50 SQL
+        g.db_pool = pool(os.environ.get("TECHNUS_DB") or os.path.join(current_app.root_path, "technus.db"))
+        g.db = g.db_pool.acquire()
     return g.db
 
 
 def close_db(error=None):
-    """Close the DB connection at the end"""
+    """Give the DB connection back to the pool at the end (kept open for the next request)"""
 
     # Remove db connection from g if any
     db = g.pop("db", None)
-    # Close the connection if any (to free resources)
     if db is not None:
-        db.close()
+        g.pop("db_pool").release(db)
 
 
 def db_teardown(app):
@@ -77,6 +419,129 @@ def db_teardown(app):
     app.teardown_appcontext(close_db)
 
 
+def rescore_articles(db, article_ids):
+    """Recompute relevance of the given articles for every user"""
+
+    # Score = number of the user's keywords the article matched
+    db.execute(f"""
+        INSERT INTO user_relevance (user_id, article_id, score)
+        SELECT uk.user_id, ak.article_id, COUNT(*)
+        FROM article_keywords ak
+        JOIN ({USER_KEYWORDS}) uk ON uk.keyword = ak.keyword
+        WHERE ak.article_id IN (SELECT value FROM json_each(?))
+        GROUP BY uk.user_id, ak.article_id
+        ON CONFLICT (user_id, article_id) DO UPDATE SET score = excluded.score
+    """, (json.dumps(list(article_ids)),))
+
+
+def sync_keyword_index(db):
+    """Add article keywords stored since the last call to the ANN index"""
+
+    missing = [
+        row["term"] for row in db.execute("SELECT DISTINCT term FROM article_terms")
+        if row["term"] not in keyword_index and row["term"] in embedding_store
+    ]
+    if missing:
+        keyword_index.add(missing, np.stack([embedding_store.get(t, touch=False) for t in missing]))
+
+
+def pin_preference_keywords(db):
+    """Keep every user's preference keywords out of embedding cache eviction"""
+
+    keywords = [row["keyword"] for row in db.execute(f"SELECT DISTINCT keyword FROM ({USER_KEYWORDS})")]
+    embedding_store.pin(keywords)
+    return keywords
+
+
+def compact_embeddings(db):
+    """Drop embeddings no stored article or preference uses, rewrite the store and the ANN index"""
+
+    live = set(pin_preference_keywords(db))
+    live.update(row["term"] for row in db.execute("SELECT DISTINCT term FROM article_terms"))
+
+    dropped = embedding_store.compact(live)
+
+    # The index holds its own copy of the vectors, rebuild it from live terms
+    keyword_index.clear()
+    sync_keyword_index(db)
+    return dropped
+
+
+def find_stored_matches(db, keywords: list[str], threshold: float = 0.92):
+    """(article id, keyword) pairs of stored articles semantically matching keywords (no refetching, no writes)
+
+    Embedding may call the API, so this runs before the caller's write
+    transaction and the database isn't locked meanwhile.
+    """
+
+    if not keywords:
+        return []
+
+    emb_matrix = get_embedding(keywords)  # Only new keywords hit the API
+    if emb_matrix is None or len(emb_matrix) != len(keywords):
+        return []
+
+    sync_keyword_index(db)
+
+    # Nearby article keywords => articles containing them
+    pairs = [
+        (keyword, term)
+        for keyword, terms in zip(keywords, keyword_index.search(emb_matrix, threshold))
+        for term in terms
+    ]
+    if not pairs:
+        return []
+
+    rows = db.execute("""
+        SELECT DISTINCT t.article_id, json_extract(p.value, '$[0]') AS keyword
+        FROM json_each(?) p
+        JOIN article_terms t ON t.term = json_extract(p.value, '$[1]')
+    """, (json.dumps(pairs),)).fetchall()
+    return [(row["article_id"], row["keyword"]) for row in rows]
+
+
+def add_stored_matches(db, matches: list[tuple[str, str]]):
+    """Index matches from find_stored_matches and rescore their articles, return number of articles matched"""
+
+    db.executemany("INSERT OR IGNORE INTO article_keywords (article_id, keyword) VALUES (?, ?)", matches)
+
+    affected = {article_id for article_id, _ in matches}
+    if affected:
+        rescore_articles(db, affected)
+    return len(affected)
+
+
+def refresh_user_relevance(db, user_id):
+    """Rebuild the user's relevance rows from their current preferences"""
+
+    db.execute("DELETE FROM user_relevance WHERE user_id = ?", (user_id,))
+    db.execute("""
+        INSERT INTO user_relevance (user_id, article_id, score)
+        SELECT p.user_id, ak.article_id, COUNT(DISTINCT ak.keyword)
+        FROM preferences p, json_each(p.keywords) k
+        JOIN article_keywords ak ON ak.keyword = k.value
+        WHERE p.user_id = ?
+        GROUP BY ak.article_id
+    """, (user_id,))
+
+
+def delete_related_rows(db, article_ids: list[str]):
+    """Remove keyword index, terms, relevance and cached text rows of articles"""
+
+    ids = json.dumps(list(article_ids))
+    for table in ("user_relevance", "article_keywords", "article_terms", "article_texts", "article_fingerprints"):
+        db.execute(f"DELETE FROM {table} WHERE article_id IN (SELECT value FROM json_each(?))", (ids,))
+    response_cache.bump(db, response_cache.ARTICLES)  # Cached dashboards showed these articles
+
+
+def delete_article_rows(db, article_ids: list[str]):
+    """Remove articles along with their keyword index, terms, relevance and cached text rows"""
+
+    delete_related_rows(db, article_ids)
+    ids = json.dumps(list(article_ids))
+    db.execute("DELETE FROM articles WHERE id IN (SELECT value FROM json_each(?))", (ids,))
+
+
 def normalize_text(text):
     """Normalize string: lowercase, remove punctuation, collapse spaces."""
 
@@ -91,74 +556,51 @@ def normalize_text(text):
     return text.strip()                   # Remove leading/trailing spaces and return
 
 
+EMBEDDING_LOOKUPS = metrics.counter("cache_requests", "Cache lookups by cache and result")
+EMBEDDING_SECONDS = metrics.histogram(
+    "embedding_seconds", "Time waiting for embeddings of uncached terms", server_timing="embed")
+
+
 def get_embedding(words: list[str]) -> np.ndarray | None:
-    """Return embedding vectors for a word list with persistent caching (with batching + rate limiting)"""
+    """Return embedding vectors for a word list with persistent caching (API calls go through the rate-limited client)"""
 
     all_emb = []  # Returned at the end
     uncached = []
 
     # Prepare the return list
     for w in words:
-        # Add embedding vectors if word is cached
-        if w in embedding_cache:
-            all_emb.append(np.array(embedding_cache[w]))
+        # Add embedding vectors if word is cached (zero-copy view into the store)
+        vec = embedding_store.get(w)
+        if vec is not None:
+            all_emb.append(vec)
         # Reserve index and mark as uncached
         else:
             all_emb.append(None)
             uncached.append(w)
 
+    EMBEDDING_LOOKUPS.inc(len(words) - len(uncached), cache="embedding", result="hit")
+    EMBEDDING_LOOKUPS.inc(len(uncached), cache="embedding", result="miss")
+
     if uncached:
-        BATCH_SIZE = 80
-        try:
-            for start_index in range(0, len(uncached), BATCH_SIZE):
-                # Batch article keywords to avoid hitting quota
-                batch = uncached[start_index:(start_index + BATCH_SIZE)]         
-                try:
-                    # Embed this batch
-                    result = [
-                        np.array(e.values) for e in client.models.embed_content(
-                            model="gemini-embedding-001",
-                            contents=batch,
-                            config=types.EmbedContentConfig(task_type="SEMANTIC_SIMILARITY", output_dimensionality=768)
-                        ).embeddings
-                    ]
-                except Exception as e:
-                    # Handle possible rate limit or network errors
-                    print(f"[Rate-limit or network error] Retrying in 15s: {e}")
-                    time.sleep(15)
-                    # Retry this batch
-                    result = [
-                        np.array(e.values) for e in client.models.embed_content(
-                            model="gemini-embedding-001",
-                            contents=batch,
-                            config=types.EmbedContentConfig(task_type="SEMANTIC_SIMILARITY", output_dimensionality=768)
-                        ).embeddings
-                    ]
-
-                # Normalize embeddings
-                result = np.array(result, dtype=float)
-                result = result / np.linalg.norm(result, axis=1, keepdims=True)  # Normalize
-
-                # Fill reserved and update cache
-                r_index = 0
-                for i, emb in enumerate(all_emb):
-                    if emb is None:
-                        all_emb[i] = result[r_index]                                   # Assign to reserved spot
-                        embedding_cache[uncached[r_index]] = result[r_index].tolist()  # Update cache => { uncached word: result }
-                        r_index += 1                                                   # Iterate through result
-
-                save_cache()
-                # Regulate requests slightly (random delay)
-                time.sleep(random.uniform(1.5, 3.0))
-        
-        except Exception as e:
-            print(f"[Embedding error] text='{words[:50]}…': {e}")
-            # Return from cached if any. Otherwise, none
+        # Batching, retries and quota are handled by the client
+        with EMBEDDING_SECONDS.time():
+            embedded = embedding_client.embed(uncached)
+        if embedded:
+            embedding_store.add(list(embedded), np.stack(list(embedded.values())))
+
+        # Fill reserved spots
+        for i, emb in enumerate(all_emb):
+            if emb is None:
+                all_emb[i] = embedded.get(words[i])
+
+        # Return from cached if any. Otherwise, none
+        if len(embedded) < len(set(uncached)):
+            print(f"[Embedding error] text='{words[:50]}…': {len(set(uncached)) - len(embedded)} terms not embedded")
             all_emb = [e for e in all_emb if e is not None]
             if not all_emb:
                 return None
             
-    return np.array(all_emb)
+    return np.stack(all_emb)  # One copy into a contiguous matrix for the similarity math
     
 
 def get_sematic_matches(user_kw: list[str], article_kw: list[str], threshold: float = 0.92) -> list[str]:
@@ -185,4 +627,47 @@ def get_sematic_matches(user_kw: list[str], article_kw: list[str], threshold: fl
         if np.any(similarity_matrix[i] >= threshold)
     ]
 
-    return matched
\ No newline at end of file
+    return matched
+
+
+def get_batch_semantic_matches(user_kw: list[str], articles_kw: list[list[str]], threshold: float = 0.92) -> list[list[str]]:
+    """Return, for each article, the user keywords that semantically match any of its keywords."""
+
+    matches = [[] for _ in articles_kw]
+
+    # Unique article keywords across the whole batch (column per keyword)
+    vocab = {}
+    for keywords in articles_kw:
+        for k in keywords:
+            vocab.setdefault(k, len(vocab))
+
+    # Skip early if no inputs
+    if not user_kw or not vocab:
+        return matches
+
+    # Embed each keyword once for the whole batch
+    emb_matrix1 = get_embedding(user_kw)
+    emb_matrix2 = get_embedding(list(vocab))
+
+    # Validate vector lists
+    if emb_matrix1 is None or emb_matrix2 is None:
+        return matches
+    
+    # Rows went missing on an API error, can't line them up with keywords
+    if len(emb_matrix1) != len(user_kw) or len(emb_matrix2) != len(vocab):
+        return [get_sematic_matches(user_kw, keywords, threshold) for keywords in articles_kw]
+
+    # Vectors are unit length, so one matmul gives every cosine similarity
+    hits = (emb_matrix1 @ emb_matrix2.T) >= threshold  # user keywords x vocab
+
+    # Gather each article's columns side by side, then OR within each article's segment
+    with_keywords = [i for i, keywords in enumerate(articles_kw) if keywords]
+    columns = [vocab[k] for i in with_keywords for k in articles_kw[i]]
+    starts = np.cumsum([0] + [len(articles_kw[i]) for i in with_keywords[:-1]])
+    per_article = np.logical_or.reduceat(hits[:, columns], starts, axis=1)  # user keywords x articles
+
+    # Keep user keywords that have at least one match above threshold
+    for col, i in enumerate(with_keywords):
+        matches[i] = [user_kw[row] for row in np.flatnonzero(per_article[:, col])]
+
+    return matches
@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import hashlib
+import multiprocessing
+import metrics
+import threading
+
+from newspaper import Article, Config
+from concurrent.futures import Future, ProcessPoolExecutor, BrokenExecutor
+
+NLP_PROCESSES = int(os.environ.get("NLP_PROCESSES", os.cpu_count() or 1))
+KEEP_FOR = 7 * 24 * 60 * 60  # Seconds a result is kept, longer than articles live (5 days)
+
+CACHE_REQUESTS = metrics.counter("cache_requests", "Cache lookups by cache and result")
+NLP_SECONDS = metrics.histogram("nlp_seconds", "Time parsing and running NLP on an article (in the process pool)")
+
+
+def content_hash(html):
+    return hashlib.sha1(html.encode("utf-8", "replace")).hexdigest()
+
+
+def parse_article(url, html):
+    """Parse and run NLP on downloaded html (runs in a worker process)
+
+    Returns (text, raw keywords)
+    """
+
+    config = Config()
+    config.browser_user_agent = os.environ.get("USER_AGENT")
+
+    article = Article(url, config=config)
+    article.download(input_html=html)
+    article.parse()
+    article.nlp()
+    return article.text.strip(), [str(k) for k in article.keywords if k]
+
+
+def lookup(db, url=None, digest=None):
+    """Cached keywords for a url or a content hash, or None"""
+
+    if url is not None:
+        row = db.execute("SELECT keywords FROM keyword_cache WHERE url = ?", (url,)).fetchone()
+    else:
+        row = db.execute("SELECT keywords FROM keyword_cache WHERE content_hash = ? LIMIT 1", (digest,)).fetchone()
+    return json.loads(row["keywords"]) if row else None
+
+
+def store(db, url, digest, keywords):
+    db.execute(
+        "INSERT OR REPLACE INTO keyword_cache (url, content_hash, keywords, processed_at) VALUES (?, ?, ?, ?)",
+        (url, digest, json.dumps(keywords), time.time()))
+    db.commit()
+
+
+def purge(db, keep_for=KEEP_FOR):
+    """Forget results older than keep_for seconds"""
+
+    return db.execute("DELETE FROM keyword_cache WHERE processed_at < ?", (time.time() - keep_for,)).rowcount
+
+
+class KeywordExtractor:
+    """NLP keyword extraction in a process pool, each url/content parsed once
+
+    Results are cached in the keyword_cache table, so a later run (or
+    another batch of this run) reuses them instead of parsing again.
+    """
+
+    def __init__(self, get_db, normalize, processes: int = NLP_PROCESSES):
+        self.get_db = get_db        # Per-thread connection
+        self.normalize = normalize  # Applied to raw keywords, in this process
+        self.processes = processes
+        self._pool = None
+        self._lock = threading.Lock()
+        self._pending = {}  # content hash => Future, shared by items with the same content
+        self.parsed = 0     # Articles actually parsed
+        self.cached = 0     # Articles served from the cache
+
+    @property
+    def pool(self):
+        # Started on first use. Spawned, not forked: forking a process full of
+        # pipeline threads can copy a lock another thread holds and deadlock the child.
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def cached_keywords(self, url):
+        """Keywords from an earlier run, so the article needn't be downloaded again"""
+
+        keywords = lookup(self.get_db(), url=url)
+        CACHE_REQUESTS.inc(cache="keywords", result="miss" if keywords is None else "hit")
+        if keywords is not None:
+            with self._lock:
+                self.cached += 1
+        return keywords
+
+    def extract(self, url, html):
+        """Return (text, keywords), text is None when the result came from the cache"""
+
+        digest = content_hash(html)
+        db = self.get_db()
+
+        # Same content under another url (syndicated copy)
+        keywords = lookup(db, digest=digest)
+        CACHE_REQUESTS.inc(cache="keywords_content", result="miss" if keywords is None else "hit")
+        if keywords is not None:
+            store(db, url, digest, keywords)
+            with self._lock:
+                self.cached += 1
+            return None, keywords
+
+        with self._lock:
+            future = self._pending.get(digest)
+            owner = future is None
+            if owner:
+                future = self._pending[digest] = Future()
+
+        if not owner:
+            return future.result()  # Another thread is parsing the same content
+
+        try:
+            try:
+                with NLP_SECONDS.time():
+                    text, raw = self.pool.submit(parse_article, url, html).result()
+                keywords = [self.normalize(k) for k in raw]
+            except BrokenExecutor:
+                raise  # The pool died, not the page: nothing cached, the item fails
+            except Exception as e:
+                print(f"Failed to parse: {url} -> {e}")
+                text, keywords = None, []  # Cached too, the same html would fail again
+
+            store(db, url, digest, keywords)
+            with self._lock:
+                self.parsed += 1
+            future.set_result((text, keywords))
+            return text, keywords
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(digest, None)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
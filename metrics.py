@@ -0,0 +1,204 @@
+import os
+import hmac
+import time
+import threading
+
+from contextlib import contextmanager
+
+PREFIX = "technus_"
+TOKEN = os.environ.get("METRICS_TOKEN")  # Bearer token the scraper sends to /metrics, unset = local requests only
+LOCAL = {"127.0.0.1", "::1"}
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Seconds
+
+_lock = threading.Lock()
+_metrics = {}  # name => Counter or Histogram, in definition order
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    pairs = list(key) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """Monotonic count per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name, help):
+        self.name = PREFIX + name + "_total"
+        self.help = help
+        self.values = {}  # label key => count
+
+    def inc(self, value=1, **labels):
+        key = _labels(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def render(self):
+        return [f"{self.name}{_format_labels(key)} {value}" for key, value in self.values.items()]
+
+
+class Histogram:
+    """Durations per label set (bucket counts, sum, count)
+
+    With `server_timing`, durations observed while handling a Flask request
+    are also added to that request's Server-Timing header under this name.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help, server_timing=None, buckets=BUCKETS):
+        self.name = PREFIX + name
+        self.help = help
+        self.server_timing = server_timing
+        self.buckets = buckets
+        self.values = {}  # label key => [bucket counts..., sum, count]
+
+    def observe(self, seconds, **labels):
+        key = _labels(labels)
+        with _lock:
+            row = self.values.get(key)
+            if row is None:
+                row = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    row[i] += 1
+            row[-2] += seconds
+            row[-1] += 1
+
+        if self.server_timing:
+            _add_server_timing(self.server_timing, seconds)
+
+    @contextmanager
+    def time(self, **labels):
+        """Time the with-block; labels may be changed inside it (e.g. the result)"""
+
+        start = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = []
+        for key, row in self.values.items():
+            for bound, count in zip(self.buckets, row):
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {row[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {row[-2]:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {row[-1]}")
+        return lines
+
+
+def _define(cls, name, *args, **kwargs):
+    """One metric object per name, so modules can define the same metric safely"""
+
+    with _lock:
+        if name not in _metrics:
+            _metrics[name] = cls(name, *args, **kwargs)
+        return _metrics[name]
+
+
+def counter(name, help):
+    return _define(Counter, name, help)
+
+
+def histogram(name, help, server_timing=None, buckets=BUCKETS):
+    return _define(Histogram, name, help, server_timing, buckets)
+
+
+def render():
+    """Every metric in Prometheus text exposition format"""
+
+    lines = []
+    with _lock:
+        for metric in _metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# Per-request Server-Timing (only when Flask is handling a request)
+
+def _add_server_timing(name, seconds):
+    try:
+        from flask import g, has_request_context
+    except ImportError:
+        return
+    if has_request_context():
+        timings = g.setdefault("server_timing", {})
+        total, count = timings.get(name, (0.0, 0))
+        timings[name] = (total + seconds, count + 1)
+
+
+def server_timing_header(timings, total=None):
+    """Server-Timing value: one entry per metric with its summed duration (ms) and count"""
+
+    entries = [f'{name};dur={seconds * 1000:.2f};desc="{count}x"' for name, (seconds, count) in timings.items()]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+REQUEST_SECONDS = histogram("http_request_seconds", "Time handling HTTP requests")
+TEMPLATE_SECONDS = histogram("template_render_seconds", "Time rendering Jinja templates", server_timing="render")
+
+
+def allowed(request):
+    """Whether a request may read /metrics: the right token, or without one configured a direct local request"""
+
+    if TOKEN:
+        given = request.headers.get("Authorization", "")
+        return hmac.compare_digest(given.encode(), f"Bearer {TOKEN}".encode())
+    # Through a proxy every client looks local, the forwarded header gives it away
+    return request.remote_addr in LOCAL and "X-Forwarded-For" not in request.headers
+
+
+def init_app(app):
+    """Time requests and template renders, add Server-Timing, serve /metrics (see allowed)"""
+
+    from flask import g, request, abort, Response, before_render_template, template_rendered
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def add_server_timing(response):
+        start = g.pop("request_start", None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        REQUEST_SECONDS.observe(
+            elapsed, endpoint=request.endpoint or "none", method=request.method, status=response.status_code)
+        response.headers["Server-Timing"] = server_timing_header(g.pop("server_timing", {}), elapsed)
+        return response
+
+    def render_started(sender, template, context, **extra):
+        g.setdefault("render_start", []).append(time.perf_counter())
+
+    def render_finished(sender, template, context, **extra):
+        starts = g.get("render_start")
+        if starts:
+            TEMPLATE_SECONDS.observe(time.perf_counter() - starts.pop(), template=template.name)
+
+    # Strong references, the handlers are local functions
+    before_render_template.connect(render_started, app, weak=False)
+    template_rendered.connect(render_finished, app, weak=False)
+
+    @app.route("/metrics")
+    def metrics():
+        if not allowed(request):
+            abort(404)  # Don't advertise it
+        return Response(render(), mimetype=None, content_type=CONTENT_TYPE)
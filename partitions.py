@@ -0,0 +1,187 @@
+import os
+import re
+import time
+import sqlite3
+
+from datetime import date, datetime, timezone
+
+# Optional storage mode: ARTICLE_PARTITIONS=day keeps one table per fetch day behind an `articles` view
+MODE = os.environ.get("ARTICLE_PARTITIONS", "").lower()
+PREFIX = "articles_p"
+CACHE_TTL = 30  # Seconds the partition list is trusted before reading sqlite_master again
+
+COLUMNS = "id, article_url, source, pub_date, keywords, title, summary, fetched_at"
+TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id TEXT PRIMARY KEY UNIQUE,
+        article_url TEXT NOT NULL,
+        source TEXT,
+        pub_date TEXT,
+        keywords TEXT NOT NULL,
+        title TEXT NOT NULL,
+        summary TEXT,
+        fetched_at TEXT DEFAULT CURRENT_DATE
+    )
+"""
+
+_cache = {"at": 0.0, "names": None}
+
+
+def enabled():
+    return MODE == "day"
+
+
+def today():
+    """Today in UTC, the clock fetched_at uses (DEFAULT CURRENT_DATE), so rows land in their own day's table"""
+    return datetime.now(timezone.utc).date()
+
+
+def partition_name(day: date):
+    return f"{PREFIX}{day:%Y%m%d}"
+
+
+def partition_day(name):
+    return date(int(name[-8:-4]), int(name[-4:-2]), int(name[-2:]))
+
+
+def list_partitions(db):
+    """Partition tables, oldest first"""
+
+    names = [row[0] for row in db.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE ? ORDER BY name", (PREFIX + "%",))]
+    names = [n for n in names if re.fullmatch(PREFIX + r"\d{8}", n)]
+    _cache.update(at=time.monotonic(), names=names)
+    return names
+
+
+def cached_partitions(db):
+    """Partition list without a catalog query on every request"""
+
+    if _cache["names"] is None or time.monotonic() - _cache["at"] > CACHE_TTL:
+        return list_partitions(db)
+    return _cache["names"]
+
+
+def invalidate():
+    _cache["names"] = None
+
+
+def is_view(db, name="articles"):
+    row = db.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+    return bool(row) and row[0] == "view"
+
+
+def rebuild_view(db):
+    """Point the `articles` view (and its write triggers) at the current partitions"""
+
+    names = list_partitions(db)
+    if not names:
+        db.execute(TABLE_DDL.format(name=partition_name(today())))
+        names = list_partitions(db)
+
+    union = " UNION ALL ".join(f"SELECT {COLUMNS} FROM {n}" for n in names)
+    updates = "".join(f"""
+            UPDATE {n} SET article_url = NEW.article_url, source = NEW.source, pub_date = NEW.pub_date,
+                keywords = NEW.keywords, title = NEW.title, summary = NEW.summary
+            WHERE id = OLD.id;""" for n in names)
+    deletes = "".join(f"\n            DELETE FROM {n} WHERE id = OLD.id;" for n in names)
+
+    # Separate statements (not executescript) so a caller's open transaction isn't committed
+    db.execute("DROP VIEW IF EXISTS articles")
+    db.execute(f"CREATE VIEW articles AS {union}")
+
+    # Writes through the view go to whichever partition holds the row
+    db.execute(f"CREATE TRIGGER articles_update INSTEAD OF UPDATE ON articles BEGIN{updates}\n        END")
+    db.execute(f"CREATE TRIGGER articles_delete INSTEAD OF DELETE ON articles BEGIN{deletes}\n        END")
+    invalidate()
+
+
+def ensure_partition(db, day: date):
+    """Create the day's partition if missing, return its name"""
+
+    name = partition_name(day)
+    if name not in cached_partitions(db) and name not in list_partitions(db):
+        db.execute(TABLE_DDL.format(name=name))
+        rebuild_view(db)
+    return name
+
+
+def init_partitions(db):
+    """Switch storage to match the configured mode (existing rows are moved over)"""
+
+    if enabled() and not is_view(db):
+        # Table => one partition per fetch day
+        for row in db.execute("SELECT DISTINCT COALESCE(DATE(fetched_at), CURRENT_DATE) FROM articles").fetchall():
+            name = partition_name(date.fromisoformat(row[0]))
+            db.execute(TABLE_DDL.format(name=name))
+            db.execute(
+                f"INSERT OR IGNORE INTO {name} ({COLUMNS}) SELECT {COLUMNS} FROM articles "
+                "WHERE COALESCE(DATE(fetched_at), CURRENT_DATE) = ?", (row[0],))
+        db.execute("DROP TABLE articles")
+        rebuild_view(db)
+        db.commit()
+
+    elif not enabled() and is_view(db):
+        # Partitions => back to a single table
+        db.execute(TABLE_DDL.format(name="articles_merged"))
+        db.execute(f"INSERT OR IGNORE INTO articles_merged ({COLUMNS}) SELECT {COLUMNS} FROM articles")
+        db.execute("DROP VIEW articles")
+        for name in list_partitions(db):
+            db.execute(f"DROP TABLE {name}")
+        db.execute("ALTER TABLE articles_merged RENAME TO articles")
+        db.commit()
+        invalidate()
+
+    elif enabled():
+        try:
+            db.execute("SELECT 1 FROM articles LIMIT 0")
+        except sqlite3.OperationalError:
+            # View over a partition that's gone (e.g. a crash mid-cleanup in older versions)
+            rebuild_view(db)
+            db.commit()
+
+    if not enabled():
+        db.execute("CREATE INDEX IF NOT EXISTS idx_articles_fetched_at ON articles(fetched_at, id)")
+
+
+def articles_source(db, tab="all", day: date = None):
+    """Table expression holding the tab's articles (a partition selection when partitioned)"""
+
+    if not enabled():
+        return "articles"
+
+    today_name = partition_name(day or today())
+    names = cached_partitions(db)
+
+    if tab == "new":
+        selected = [n for n in names if n == today_name]
+    elif tab == "old":
+        selected = [n for n in names if n < today_name]
+    else:
+        return "articles"
+
+    if not selected:
+        return f"(SELECT {COLUMNS} FROM articles WHERE 0)"  # Empty, same columns
+    return "(" + " UNION ALL ".join(f"SELECT {COLUMNS} FROM {n}" for n in selected) + ")"
+
+
+def drop_partitions_before(db, cutoff: date, on_drop=None):
+    """Drop whole days older than cutoff, return the number of articles dropped"""
+
+    dropped = 0
+    old = [n for n in list_partitions(db) if partition_day(n) < cutoff]
+    if not old:
+        return 0
+
+    # One transaction with the view rebuild, so readers never see a view over a dropped table
+    with db:
+        if not db.in_transaction:
+            db.execute("BEGIN")  # DDL alone doesn't open one
+        for name in old:
+            ids = [row[0] for row in db.execute(f"SELECT id FROM {name}")]
+            if on_drop:
+                on_drop(ids)  # Related rows outside the partition
+            db.execute(f"DROP TABLE {name}")
+            dropped += len(ids)
+        rebuild_view(db)
+    return dropped
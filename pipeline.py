@@ -0,0 +1,246 @@
+import time
+import queue
+import threading
+
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+_DONE = object()  # Sentinel telling workers that upstream has finished
+POLL = 0.2        # Seconds a blocked put/get waits before checking whether the run was cancelled
+
+
+class HostLimiter:
+    """Cap how many requests may hit the same host at once"""
+
+    def __init__(self, per_host: int = 2):
+        self.per_host = max(1, per_host)
+        self._lock = threading.Lock()
+        self._slots = {}  # host => semaphore
+
+    def _semaphore(self, url):
+        host = urlsplit(url or "").netloc.lower()
+        with self._lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._slots[host]
+
+    @contextmanager
+    def limit(self, url):
+        """Block until a slot for the url's host is free"""
+
+        semaphore = self._semaphore(url)
+        with semaphore:
+            yield
+
+
+class Stage:
+    """One step of the pipeline with its own worker pool and bounded input queue"""
+
+    def __init__(self, name, func, workers: int = 1, queue_size: int = 32, fan_out: bool = False,
+                 batch_size: int = 1, batch_wait: float = 0.5):
+        self.name = name
+        self.func = func                # func(item) -> item, None (drop) or iterable if fan_out
+        self.workers = max(1, workers)
+        self.fan_out = fan_out
+        self.batch_size = max(1, batch_size)  # > 1: func gets a list of items and returns an iterable
+        self.batch_wait = batch_wait          # Seconds to wait for a batch to fill up
+        self.inbox = queue.Queue(maxsize=queue_size)  # Bounded => upstream blocks (backpressure)
+
+        # Stats for the run report
+        self.lock = threading.Lock()
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.started = None
+        self.finished = None
+
+    def record(self, produced, start, end, failed=False, consumed=1):
+        with self.lock:
+            self.items_in += consumed
+            self.items_out += produced
+            self.errors += consumed if failed else 0
+            self.busy += end - start
+            self.started = start if self.started is None else min(self.started, start)
+            self.finished = end if self.finished is None else max(self.finished, end)
+
+    def stats(self):
+        wall = (self.finished - self.started) if self.started is not None else 0.0
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "in": self.items_in,
+            "out": self.items_out,
+            "dropped": 0 if self.fan_out else self.items_in - self.items_out - self.errors,
+            "errors": self.errors,
+            "wall_s": round(wall, 3),
+            "busy_s": round(self.busy, 3),
+            "per_s": round(self.items_out / wall, 2) if wall else 0.0,
+        }
+
+
+class PipelineReport:
+    """Per-stage throughput of one pipeline run"""
+
+    def __init__(self, stages, elapsed):
+        self.stages = [s.stats() for s in stages]
+        self.elapsed = round(elapsed, 3)
+
+    def as_dict(self):
+        return {"elapsed_s": self.elapsed, "stages": self.stages}
+
+    def __str__(self):
+        lines = [f"{'stage':<12}{'workers':>8}{'in':>6}{'out':>6}{'dropped':>9}{'errors':>8}{'wall s':>9}{'busy s':>9}{'out/s':>10}"]
+        for s in self.stages:
+            lines.append(
+                f"{s['stage']:<12}{s['workers']:>8}{s['in']:>6}{s['out']:>6}{s['dropped']:>9}{s['errors']:>8}"
+                f"{s['wall_s']:>9}{s['busy_s']:>9}{s['per_s']:>10}")
+        lines.append(f"Total: {self.elapsed}s")
+        return "\n".join(lines)
+
+
+class Pipeline:
+    """Run items through stages, each stage on its own thread pool"""
+
+    def __init__(self, stages: list[Stage], queue_size: int = 32, on_thread_exit=None):
+        self.stages = stages
+        self.on_thread_exit = on_thread_exit  # Called by each worker thread as it ends (e.g. close its db)
+        self.outbox = queue.Queue(maxsize=queue_size)
+        self.report = None
+        self._stop = threading.Event()  # Set when the caller abandons a run
+
+    def _put(self, q, item):
+        """Put into a bounded queue, False if the run was cancelled meanwhile"""
+
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=POLL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        """Get from a queue, _DONE if the run was cancelled meanwhile"""
+
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=POLL)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _take(self, stage):
+        """Next unit of work: one item, or up to batch_size items. None once upstream is done"""
+
+        item = self._get(stage.inbox)
+        if item is _DONE:
+            return None
+        if stage.batch_size == 1:
+            return item
+
+        # Fill the batch, but don't hold items back for long
+        batch = [item]
+        deadline = time.perf_counter() + stage.batch_wait
+        while len(batch) < stage.batch_size:
+            try:
+                item = stage.inbox.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            if item is _DONE:
+                self._put(stage.inbox, _DONE)  # Seen again on the next take
+                break
+            batch.append(item)
+        return batch
+
+    def _worker(self, stage, downstream):
+        try:
+            self._work(stage, downstream)
+        finally:
+            if self.on_thread_exit:
+                self.on_thread_exit()
+
+    def _work(self, stage, downstream):
+        while True:
+            work = self._take(stage)
+            if work is None:
+                break
+
+            batched = stage.batch_size > 1
+            consumed = len(work) if batched else 1
+            start = time.perf_counter()
+            produced = 0
+            try:
+                result = stage.func(work)
+                # Pass results on as soon as they exist (generators stream item by item)
+                outputs = (result or []) if stage.fan_out or batched else ([] if result is None else [result])
+                for output in outputs:
+                    if not self._put(downstream, output):
+                        return  # Cancelled, nobody reads the results
+                    produced += 1
+                stage.record(produced, start, time.perf_counter(), consumed=consumed)
+            except Exception as e:
+                print(f"[{stage.name}] failed: {e}")
+                stage.record(produced, start, time.perf_counter(), failed=True, consumed=consumed)
+
+    def _close(self, stage, threads, downstream, downstream_workers):
+        """Wait for a stage to drain, then tell the next stage to stop"""
+
+        for t in threads:
+            t.join()
+        for _ in range(downstream_workers):
+            self._put(downstream, _DONE)
+
+    def run(self, inputs):
+        """Yield finished items while the pipeline runs, report is set when exhausted
+
+        Closing the generator early (or an exception in the consuming loop)
+        cancels the run: every worker stops at its next queue operation.
+        """
+
+        start = time.perf_counter()
+        supervisors = []
+        self._stop.clear()
+
+        for i, stage in enumerate(self.stages):
+            last = i == len(self.stages) - 1
+            downstream = self.outbox if last else self.stages[i + 1].inbox
+            downstream_workers = 1 if last else self.stages[i + 1].workers
+
+            threads = [
+                threading.Thread(target=self._worker, args=(stage, downstream), daemon=True)
+                for _ in range(stage.workers)
+            ]
+            for t in threads:
+                t.start()
+
+            supervisor = threading.Thread(
+                target=self._close, args=(stage, threads, downstream, downstream_workers), daemon=True)
+            supervisor.start()
+            supervisors.append(supervisor)
+
+        # Feed the first stage from a separate thread so results can be consumed meanwhile
+        def feed():
+            first = self.stages[0]
+            for item in inputs:
+                if not self._put(first.inbox, item):
+                    return
+            for _ in range(first.workers):
+                self._put(first.inbox, _DONE)
+
+        threading.Thread(target=feed, daemon=True).start()
+
+        item = None
+        try:
+            while True:
+                item = self.outbox.get()
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            if item is not _DONE:
+                self._stop.set()  # Abandoned: unblock and stop every thread
+
+        for s in supervisors:
+            s.join()
+        self.report = PipelineReport(self.stages, time.perf_counter() - start)
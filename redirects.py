@@ -0,0 +1,90 @@
+import os
+import time
+import metrics
+import threading
+import requests
+
+from requests.adapters import HTTPAdapter
+
+REDIRECT_TTL = int(os.environ.get("REDIRECT_TTL", 7 * 24 * 60 * 60))  # Seconds a resolved link is trusted
+
+CACHE_REQUESTS = metrics.counter("cache_requests", "Cache lookups by cache and result")
+REDIRECT_SECONDS = metrics.histogram("redirect_seconds", "Time resolving redirect links over the network")
+
+
+def pooled_session(pool_size: int = 16, user_agent: str = None):
+    """requests.Session with keep-alive connections shared by every stage"""
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if user_agent:
+        session.headers["User-Agent"] = user_agent
+    return session
+
+
+class RedirectResolver:
+    """Follow redirect links without downloading the target page
+
+    Results are kept in the redirects table for `ttl` seconds, so a
+    link seen in another batch or an earlier run isn't requested again.
+    """
+
+    def __init__(self, session, get_db, ttl: int = REDIRECT_TTL):
+        self.session = session
+        self.get_db = get_db  # Per-thread connection
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._seen = {}     # link => target, this run
+        self.cached = 0     # Links answered from the map
+        self.requests = 0   # Links resolved over the network
+
+    def lookup(self, link):
+        with self._lock:
+            target = self._seen.get(link)
+        if target is None:
+            row = self.get_db().execute(
+                "SELECT target FROM redirects WHERE url = ? AND resolved_at > ?",
+                (link, time.time() - self.ttl)).fetchone()
+            target = row["target"] if row else None
+        CACHE_REQUESTS.inc(cache="redirects", result="miss" if target is None else "hit")
+        if target is not None:
+            with self._lock:
+                self._seen[link] = target
+                self.cached += 1
+        return target
+
+    def follow(self, link, timeout=5):
+        """Final url after redirects: HEAD first, a streamed GET (body never read) if HEAD isn't allowed"""
+
+        response = self.session.head(link, allow_redirects=True, timeout=timeout)
+        if response.status_code >= 400:
+            response = self.session.get(link, allow_redirects=True, timeout=timeout, stream=True)
+            response.close()  # Headers are enough, drop the connection's unread body
+            response.raise_for_status()
+        return response.url
+
+    def resolve(self, link, timeout=5):
+        target = self.lookup(link)
+        if target is not None:
+            return target
+
+        with REDIRECT_SECONDS.time():
+            target = self.follow(link, timeout)
+        with self._lock:
+            self._seen[link] = target
+            self.requests += 1
+
+        db = self.get_db()
+        db.execute(
+            "INSERT OR REPLACE INTO redirects (url, target, resolved_at) VALUES (?, ?, ?)",
+            (link, target, time.time()))
+        db.commit()
+        return target
+
+
+def purge(db, ttl=REDIRECT_TTL):
+    """Forget links resolved more than ttl seconds ago"""
+
+    return db.execute("DELETE FROM redirects WHERE resolved_at < ?", (time.time() - ttl,)).rowcount
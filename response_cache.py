@@ -0,0 +1,74 @@
+import os
+import hashlib
+import metrics
+import threading
+
+from collections import OrderedDict
+
+CACHE_SIZE = int(os.environ.get("PAGE_CACHE_SIZE", 2000))  # Rendered pages kept per process, 0 disables
+
+# Version names: every user's pages depend on ARTICLES, one user's on user_version(id)
+ARTICLES = "articles"
+
+CACHE_REQUESTS = metrics.counter("cache_requests", "Cache lookups by cache and result")
+
+
+def user_version(user_id):
+    return f"user:{user_id}"
+
+
+def bump(db, *names):
+    """Invalidate cached pages depending on names (in the caller's transaction, seen by every process)"""
+
+    db.executemany("""
+        INSERT INTO cache_versions (name, version) VALUES (?, 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1
+    """, [(name,) for name in names])
+
+
+def versions(db, user_id):
+    """(articles version, user's version), part of every cache key"""
+
+    found = dict(db.execute(
+        "SELECT name, version FROM cache_versions WHERE name IN (?, ?)", (ARTICLES, user_version(user_id))).fetchall())
+    return found.get(ARTICLES, 0), found.get(user_version(user_id), 0)
+
+
+def etag(key):
+    """Same key => same page, so a hash of the key is a strong validator"""
+
+    return hashlib.blake2b(repr(key).encode(), digest_size=12).hexdigest()
+
+
+class ResponseCache:
+    """Rendered responses by key, least recently used dropped first
+
+    Keys contain the versions, so a bump makes old entries unreachable
+    and they age out instead of being deleted.
+    """
+
+    def __init__(self, size: int = CACHE_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key => (body, mimetype)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        CACHE_REQUESTS.inc(cache="pages", result="miss" if entry is None else "hit")
+        return entry
+
+    def put(self, key, entry):
+        if not self.size:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,131 @@
+import os
+import time
+import secrets
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+# "sqlite" (sessions table in technus.db), "cookie" (Flask's signed cookies) or "filesystem" (Flask-Session)
+BACKEND = os.environ.get("SESSION_BACKEND", "sqlite")
+
+
+class SqliteSession(CallbackDict, SessionMixin):
+    """Session dict that remembers its id and whether it changed"""
+
+    def __init__(self, initial=None, sid=None, expires_at=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = sid is None
+        self.expires_at = expires_at
+        self.modified = False
+        self.replaced = None  # Previous id after regenerate(), its row is deleted on save
+
+
+class SqliteSessionInterface(SessionInterface):
+    """Sessions stored as rows of the sessions table, looked up by id (the cookie value)
+
+    A row is only written when the session changed or half its lifetime
+    has passed, so most requests cost a single primary key lookup.
+    Expired rows are ignored and deleted by purge() during cleanup.
+    """
+
+    serializer = TaggedJSONSerializer()  # The format Flask's cookie sessions use
+    session_class = SqliteSession
+
+    def __init__(self, get_db):
+        self.get_db = get_db  # Request's connection
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            row = self.get_db().execute(
+                "SELECT data, expires_at FROM sessions WHERE id = ? AND expires_at > ?", (sid, time.time())).fetchone()
+            if row:
+                try:
+                    return self.session_class(self.serializer.loads(row["data"]), sid, row["expires_at"])
+                except ValueError:
+                    pass  # Unreadable, start over
+        return self.session_class()
+
+    def regenerate(self, session):
+        """Give the session a new id when saved, the old id stops working (call on login)"""
+
+        session.replaced = session.replaced or session.sid
+        session.sid = None
+        session.modified = True
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        db = self.get_db()
+
+        # Emptied (logout): forget the row and the cookie
+        if not session:
+            if session.modified and (session.sid or session.replaced):
+                with db:
+                    db.execute("DELETE FROM sessions WHERE id IN (?, ?)", (session.sid, session.replaced))
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = time.time()
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        refresh = session.expires_at is None or session.expires_at - now < lifetime / 2
+        if not session.modified and not refresh:
+            return
+
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        session.expires_at = now + lifetime
+        with db:
+            if session.replaced:
+                db.execute("DELETE FROM sessions WHERE id = ?", (session.replaced,))
+            db.execute("""
+                INSERT INTO sessions (id, data, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at
+            """, (session.sid, self.serializer.dumps(dict(session)), session.expires_at))
+
+        response.set_cookie(
+            name, session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app))
+        response.vary.add("Cookie")
+
+
+def regenerate(app, session):
+    """New session id on login, so an id planted before login (session fixation) is worthless
+
+    Signed cookie sessions have no server-side id, nothing to do there.
+    """
+
+    interface = app.session_interface
+    if hasattr(interface, "regenerate"):  # Ours, and Flask-Session's
+        interface.regenerate(session)
+
+
+def purge(db):
+    """Delete expired sessions"""
+
+    return db.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),)).rowcount
+
+
+def init_app(app, backend=BACKEND):
+    """Use the configured session backend for app"""
+
+    if backend == "sqlite":
+        from helpers import get_db
+        app.session_interface = SqliteSessionInterface(get_db)
+    elif backend == "filesystem":
+        from flask_session import Session
+        app.config["SESSION_TYPE"] = "filesystem"
+        Session(app)
+    elif backend != "cookie":  # Flask's default interface already signs cookies
+        raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
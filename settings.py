@@ -1,9 +1,11 @@
 import os
 import json
 import uuid
+import response_cache
 
 from werkzeug.utils import secure_filename
-from helpers import login_required, get_db, normalize_text
+from helpers import login_required, get_db, normalize_text, refresh_user_relevance, find_stored_matches, \
+    add_stored_matches, pin_preference_keywords
 from flask import Blueprint, render_template, request, redirect, session, flash, current_app
 
 # https://realpython.com/flask-blueprint/
@@ -150,16 +152,30 @@ def preferences():
                 prefs={key: json.dumps(values) for key, values in prefs.items()},  # Convert lists to strings
             )   
                 
-        # Overwrite preferences
-        db.execute("DELETE FROM preferences WHERE user_id = ?", (session["user_id"],))
-
-        # Insert JSON lists into relevant types
-        for key, values in {"jobs": jobs, "industries": industries, "keywords": keywords}.items():
-            db.execute(
-                "INSERT INTO preferences (user_id, type_id, keywords) VALUES (?, ?, ?)",
-                (session["user_id"], type_map[key], json.dumps(values)))
-                
-        db.commit()
+        # Match stored articles to the new keywords (semantic) before writing anything,
+        # so embedding API calls don't hold the database write lock
+        matches = find_stored_matches(db, list(dict.fromkeys(jobs + industries + keywords)))
+
+        with db:  # One short transaction
+            # Overwrite preferences
+            db.execute("DELETE FROM preferences WHERE user_id = ?", (session["user_id"],))
+
+            # Insert JSON lists into relevant types
+            for key, values in {"jobs": jobs, "industries": industries, "keywords": keywords}.items():
+                db.execute(
+                    "INSERT INTO preferences (user_id, type_id, keywords) VALUES (?, ?, ?)",
+                    (session["user_id"], type_map[key], json.dumps(values)))
+
+            # Index the matches, then rebuild relevance
+            matched = add_stored_matches(db, matches)
+            refresh_user_relevance(db, session["user_id"])
+
+            # This user's dashboard changed, every user's if stored articles gained keywords
+            response_cache.bump(db, response_cache.user_version(session["user_id"]))
+            if matched:
+                response_cache.bump(db, response_cache.ARTICLES)
+
+        pin_preference_keywords(db)
         flash("Preferences saved successfully!")
         return redirect("/preferences")
 
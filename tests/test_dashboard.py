@@ -0,0 +1,174 @@
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+USERS = 3
+ARTICLES = 200
+
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    """The app on a seeded temporary database (embedding store files go to the temp dir too)"""
+
+    workdir = tmp_path_factory.mktemp("technus")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    os.environ["TECHNUS_DB"] = str(workdir / "technus.db")
+    os.environ.setdefault("SECRET_KEY", "test")
+    os.environ.setdefault("GEMINI_API_KEY", "test")
+
+    from benchmarks.seed import create_db, add_user, add_articles, words
+    create_db(os.environ["TECHNUS_DB"]).close()
+
+    import helpers
+    db = helpers.thread_db(os.environ["TECHNUS_DB"])
+    helpers.init_schema(db)
+    vocabulary = words(40)
+    for n in range(USERS):
+        add_user(db, n, vocabulary[n * 5:n * 5 + 5])
+    add_articles(db, ARTICLES, vocabulary)
+    for n in range(USERS):
+        helpers.refresh_user_relevance(db, n + 1)
+    db.commit()
+
+    from app import app
+    app.testing = True
+    yield app
+    os.chdir(cwd)
+
+
+def traced(app, client, path, **kwargs):
+    """Response and every SQL statement the request ran"""
+
+    import helpers
+    statements = []
+    pool = helpers.pool(os.environ["TECHNUS_DB"])
+    db = pool.acquire()
+    pool.release(db)  # The connection the request borrows next
+    db.set_trace_callback(statements.append)
+    try:
+        response = client.get(path, **kwargs)
+    finally:
+        db.set_trace_callback(None)
+    return response, statements
+
+
+def login(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = user_id
+    return client
+
+
+def kinds(statements):
+    """What each statement was for, so a failing count shows which query is new"""
+
+    labels = []
+    for sql in statements:
+        if "FROM sessions" in sql:
+            labels.append("session")
+        elif "FROM cache_versions" in sql:
+            labels.append("versions")
+        elif "FROM user_relevance" in sql:
+            labels.append("articles")
+        elif sql.split()[0].upper() in ("BEGIN", "COMMIT") or "INTO sessions" in sql:
+            labels.append("session write")
+        else:
+            labels.append(sql.split()[0].lower())
+    return labels
+
+
+def test_dashboard_render_runs_one_articles_query(app):
+    client = login(app, 1)
+    response, statements = traced(app, client, "/")
+
+    assert response.status_code == 200
+    # Session, cache versions before and after rendering, one statement for rows + "new" count + preference check.
+    # The "new articles" flash changes the session, so it's saved.
+    assert kinds(statements) == [
+        "session", "versions", "articles", "versions", "session write", "session write", "session write"]
+
+
+def test_cached_dashboard_skips_the_articles_query(app):
+    client = login(app, 2)
+    first = client.get("/")
+
+    response, statements = traced(app, client, "/")
+    assert response.status_code == 200
+    assert response.data == first.data
+    assert kinds(statements) == ["session", "versions"]
+
+    response, statements = traced(app, client, "/", headers={"If-None-Match": first.headers["ETag"]})
+    assert response.status_code == 304
+    assert kinds(statements) == ["session", "versions"]
+
+
+def test_next_page_runs_one_articles_query(app):
+    client = login(app, 3)
+    first = client.get("/articles?tab=all")
+    cursor = first.get_json()["next_cursor"]
+    assert cursor
+
+    response, statements = traced(app, client, f"/articles?tab=all&cursor={cursor}&offset=20")
+    assert response.status_code == 200
+    assert kinds(statements) == ["session", "versions", "articles", "versions"]
+
+
+def plan(sql):
+    """EXPLAIN QUERY PLAN of a traced statement (parameters are already inlined)"""
+
+    import helpers
+    db = helpers.thread_db(os.environ["TECHNUS_DB"])
+    return [row["detail"] for row in db.execute("EXPLAIN QUERY PLAN " + sql)]
+
+
+@pytest.mark.parametrize("tab", ["all", "new", "old"])
+def test_pages_seek_the_fetched_at_index(app, tab):
+    import partitions
+    from app import page_cache, encode_cursor
+    client = login(app, 1)
+    cursor = encode_cursor(partitions.today().isoformat(), "bench-9999999")
+
+    for path in (f"/?tab={tab}", f"/articles?tab={tab}&cursor={cursor}&offset=20"):
+        page_cache.clear()
+        response, statements = traced(app, client, path)
+        assert response.status_code == 200
+        [query] = [sql for sql, kind in zip(statements, kinds(statements)) if kind == "articles"]
+        steps = plan(query)
+
+        # Walked in index order from the cursor: no materialized relevance set, no sort
+        assert any("idx_articles_fetched_at" in step for step in steps), steps
+        assert not any("TEMP B-TREE" in step or "MATERIALIZE" in step for step in steps), steps
+        assert not any(step.startswith("SCAN") and "articles" not in step for step in steps), steps
+
+
+def test_cursor_round_trip(app):
+    from app import encode_cursor, decode_cursor
+
+    cursor = encode_cursor("2026-01-31", "id/with+odd=chars")
+    assert "=" not in cursor and "/" not in cursor  # Safe in a query string without escaping
+    assert decode_cursor(cursor) == ("2026-01-31", "id/with+odd=chars")
+
+    # Missing or tampered cursors start from the first page
+    for bad in (None, "", "not base64!", encode_cursor("only", "two")[:-4], "WzFd"):
+        assert decode_cursor(bad) is None
+
+
+def test_cursor_pages_cover_every_article_once(app):
+    client = login(app, 1)
+    seen, cursor = [], None
+    while True:
+        page = client.get("/articles?tab=all" + (f"&cursor={cursor}" if cursor else "")).get_json()
+        seen.extend(a["id"] for a in page["articles"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    import helpers
+    db = helpers.thread_db(os.environ["TECHNUS_DB"])
+    relevant = {row[0] for row in db.execute("SELECT article_id FROM user_relevance WHERE user_id = 1")}
+    assert len(seen) == len(set(seen)) == len(relevant)
+    assert set(seen) == relevant
@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dedup import Fingerprints, canonical_url, title_words, simhash, distance, MAX_DISTANCE
+
+
+def test_canonical_url_drops_tracking_and_mirrors():
+    assert canonical_url("http://www.Example.com/a/story/?utm_source=x&id=2#top") == "https://example.com/a/story?id=2"
+    assert canonical_url("https://m.example.com/a/story/amp") == "https://example.com/a/story"
+    assert canonical_url("https://example.com/a?b=2&a=1") == canonical_url("https://example.com/a?a=1&b=2")
+
+
+def test_simhash_matches_the_same_title_from_another_source():
+    a = simhash(title_words("Nvidia unveils new AI chips for data centers - The Verge", "The Verge"))
+    b = simhash(title_words("Nvidia unveils new AI chips for data centers | Reuters", "Reuters"))
+    c = simhash(title_words("Apple delays its mixed reality headset again"))
+    assert distance(a, b) <= MAX_DISTANCE
+    assert distance(a, c) > MAX_DISTANCE
+    assert simhash(title_words("AI news")) is None  # Too short to compare
+
+
+def test_fingerprints_claim_first_owner():
+    prints = Fingerprints()
+    value = simhash(title_words("Nvidia unveils new AI chips for data centers"))
+    assert prints.claim("a", "https://example.com/a", value) == "a"
+    assert prints.claim("b", "https://example.com/a", None) == "a"   # Same url
+    assert prints.claim("c", "https://other.com/c", value) == "a"     # Same title
+    assert prints.claim("d", "https://other.com/d", None) == "d"
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.environ.setdefault("GEMINI_API_KEY", "test")
+
+    import partitions
+    monkeypatch.setattr(partitions, "MODE", "")  # Rows are inserted into a plain articles table
+
+    from benchmarks.seed import create_db, add_user
+    path = str(tmp_path / "technus.db")
+    create_db(path).close()
+
+    import helpers
+    db = helpers.connect(path)
+    add_user(db, 0, ["ai", "chips"])
+    yield db
+    db.close()
+
+
+def test_merge_articles_folds_the_copy_into_the_kept_one(db):
+    import helpers
+    db.executemany(
+        "INSERT INTO articles (id, article_url, source, keywords, title, summary) VALUES (?, ?, ?, ?, ?, ?)", [
+            ("kept", "https://example.com/a", "Example", '["ai"]', "Story", None),
+            ("copy", "https://example.com/a?utm_source=x", "Other", '["chips"]', "Story", "Summary"),
+        ])
+    db.executemany("INSERT INTO article_keywords (article_id, keyword) VALUES (?, ?)",
+                   [("kept", "ai"), ("copy", "chips")])
+    db.execute("INSERT INTO article_terms (article_id, term) VALUES ('copy', 'gpus')")
+    db.execute("INSERT INTO article_texts (url, article_id, body, size, stored_at, accessed_at) "
+               "VALUES ('https://example.com/a?utm_source=x', 'copy', x'00', 1, 0, 0)")
+
+    with db:
+        helpers.merge_articles(db, [("copy", "kept")])
+
+    kept = db.execute("SELECT keywords, summary FROM articles WHERE id = 'kept'").fetchone()
+    assert sorted(json.loads(kept["keywords"])) == ["ai", "chips"]
+    assert kept["summary"] == "Summary"
+    assert db.execute("SELECT COUNT(*) FROM articles WHERE id = 'copy'").fetchone()[0] == 0
+    assert {r[0] for r in db.execute("SELECT keyword FROM article_keywords WHERE article_id = 'kept'")} == {"ai", "chips"}
+    assert [r[0] for r in db.execute("SELECT term FROM article_terms WHERE article_id = 'kept'")] == ["gpus"]
+    assert db.execute("SELECT article_id FROM article_texts").fetchone()[0] == "kept"
+    assert db.execute("SELECT score FROM user_relevance WHERE article_id = 'kept'").fetchone()[0] == 2
@@ -0,0 +1,108 @@
+import os
+import sys
+import json
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import embedding_store
+from embedding_store import EmbeddingStore
+
+DIM = 4
+
+
+def vec(value):
+    return np.full(DIM, value, dtype=np.float32)
+
+
+@pytest.fixture
+def path(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_store, "SYNC_INTERVAL", 0)  # Check the files on every lookup
+    return str(tmp_path / "store")
+
+
+def test_round_trip_and_reopen(path):
+    store = EmbeddingStore(path, dim=DIM)
+    store.add(["ai", "chips", "ai"], [vec(1), vec(2), vec(3)])
+    assert len(store) == 2
+    assert store.get("ai")[0] == 1  # First copy wins, repeats are skipped
+
+    reopened = EmbeddingStore(path, dim=DIM)
+    assert reopened.get("chips")[0] == 2
+    assert reopened.get("gpus") is None
+
+
+def test_crash_between_the_two_appends_is_cut_back(path):
+    store = EmbeddingStore(path, dim=DIM)
+    store.add(["ai"], [vec(1)])
+
+    # Vectors written, index line not (or only half of it)
+    with open(f"{path}.f32", "ab") as f:
+        f.write(vec(9).tobytes())
+    with open(f"{path}.idx", "ab") as f:
+        f.write(b'"half')
+
+    store = EmbeddingStore(path, dim=DIM)
+    assert len(store) == 1
+
+    store.add(["chips"], [vec(2)])
+    assert os.path.getsize(f"{path}.f32") == 2 * DIM * 4
+    with open(f"{path}.idx") as f:
+        assert [json.loads(line) for line in f] == ["ai", "chips"]
+    assert EmbeddingStore(path, dim=DIM).get("chips")[0] == 2
+
+
+def test_interrupted_compaction_rolls_forward(path):
+    store = EmbeddingStore(path, dim=DIM)
+    store.add(["ai", "chips"], [vec(1), vec(2)])
+
+    # Both temp files complete and the marker written, then the process died before the swaps
+    with open(f"{path}.f32.tmp", "wb") as f:
+        f.write(vec(2).tobytes())
+    with open(f"{path}.idx.tmp", "w") as f:
+        f.write('"chips"\n')
+    open(f"{path}.compacting", "w").close()
+
+    store = EmbeddingStore(path, dim=DIM)
+    assert not os.path.exists(f"{path}.compacting")
+    assert "ai" not in store
+    assert store.get("chips")[0] == 2
+
+
+def test_other_process_appends_are_picked_up(path):
+    web, worker = EmbeddingStore(path, dim=DIM), EmbeddingStore(path, dim=DIM)
+    web.add(["ai"], [vec(1)])
+    worker.add(["chips"], [vec(2)])  # Row 1, after the web's row 0
+    web.add(["gpus"], [vec(3)])      # Row 2, not row 1 again
+
+    for store in (web, worker):
+        assert [store.get(t)[0] for t in ("ai", "chips", "gpus")] == [1, 2, 3]
+
+
+def test_compaction_elsewhere_bumps_the_generation(path):
+    web, worker = EmbeddingStore(path, dim=DIM), EmbeddingStore(path, dim=DIM)
+    web.add(["ai", "chips", "gpus"], [vec(1), vec(2), vec(3)])
+    assert worker.get("gpus")[0] == 3
+    generation = worker._generation
+
+    assert worker.compact(live=["gpus"]) == 2
+    assert web.get("gpus")[0] == 3  # Row 0 now, the web reloaded its row numbers
+    assert web._generation == generation + 1
+    assert web.get("ai") is None
+
+    web.add(["ai"], [vec(4)])
+    assert worker.get("ai")[0] == 4 and worker.get("gpus")[0] == 3
+
+
+def test_eviction_keeps_pinned_terms(path):
+    store = EmbeddingStore(path, dim=DIM, capacity=4)
+    store.pin(["keep"])
+    store.add(["keep"], [vec(0)])
+    for n in range(1, 10):
+        store.add([f"term{n}"], [vec(n)])
+
+    assert len(store) <= 4
+    assert store.get("keep")[0] == 0
+    assert store.get("term9")[0] == 9  # Newest survives
@@ -0,0 +1,157 @@
+import io
+import os
+import sys
+import pytest
+
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FEED_ETAG = '"feed-v1"'
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+        self.raw = io.BytesIO(text.encode())
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def close(self):
+        pass
+
+
+class FakeHttp:
+    """Google News feed with two stories, the second story's page fails while `broken`"""
+
+    def __init__(self):
+        self.broken = True
+        self.requests = []  # (url, If-None-Match)
+        self.stories = [(f"story-{n}", f"https://site{n}.example/story", f"Chips story {n}") for n in (1, 2)]
+
+    def get(self, url, headers=None, **kwargs):
+        etag = (headers or {}).get("If-None-Match")
+        self.requests.append((url, etag))
+
+        if "news.google.com/rss/search" in url:
+            if etag == FEED_ETAG:
+                return FakeResponse(304)
+            now = format_datetime(datetime.now(timezone.utc))
+            items = "".join(
+                f"<item><title>{title}</title><link>{link}</link>"
+                f"<guid>{guid}</guid><pubDate>{now}</pubDate><source>Example</source></item>"
+                for guid, link, title in self.stories)
+            return FakeResponse(text=f"<rss><channel>{items}</channel></rss>", headers={"ETag": FEED_ETAG})
+
+        if url == "https://site2.example/story" and self.broken:
+            return FakeResponse(500)
+        return FakeResponse(text="<html><body>chips</body></html>")
+
+    def downloads(self, url):
+        return [r for r in self.requests if r[0] == url]
+
+
+@pytest.fixture
+def fetch(tmp_path, monkeypatch):
+    """fetch_news on a temporary database with one user interested in chips, no network or NLP"""
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("TECHNUS_DB", str(tmp_path / "technus.db"))
+    os.environ.setdefault("SECRET_KEY", "test")
+    os.environ.setdefault("GEMINI_API_KEY", "test")
+
+    from benchmarks.seed import create_db, add_user
+    create_db(os.environ["TECHNUS_DB"]).close()
+
+    import helpers
+    import fetch_news
+    db = helpers.connect(os.environ["TECHNUS_DB"])
+    add_user(db, 0, ["chips"])
+    db.commit()
+
+    http = FakeHttp()
+    monkeypatch.setattr(fetch_news, "http", http)
+    monkeypatch.setattr(fetch_news, "get_db", lambda: db)
+    monkeypatch.setattr(fetch_news.keyword_extractor, "cached_keywords", lambda url: None)
+    monkeypatch.setattr(fetch_news.keyword_extractor, "extract", lambda url, html: ("chips text", ["chips"]))
+    monkeypatch.setattr(
+        fetch_news, "get_batch_semantic_matches",
+        lambda batch, articles_kw, threshold=0.92: [[k for k in batch if k in kws] for kws in articles_kw])
+
+    yield fetch_news, http, db
+    db.close()
+
+
+def test_failed_download_keeps_the_feed_watermark(fetch):
+    fetch_news, http, db = fetch
+
+    fetch_news.fetch_tech_articles()
+    assert [row["id"] for row in db.execute("SELECT id FROM articles")] == ["story-1"]
+    # The feed's ETag would make the next run get a 304 and never see story 2 again
+    assert db.execute("SELECT COUNT(*) FROM feed_watermarks").fetchone()[0] == 0
+
+    http.broken = False
+    http.requests.clear()
+    fetch_news.fetch_tech_articles()
+
+    feed = [r for r in http.requests if "news.google.com" in r[0]]
+    assert feed and feed[0][1] is None
+    assert http.downloads("https://site2.example/story")
+    assert not http.downloads("https://site1.example/story")  # Stored, not downloaded again
+    assert sorted(row["id"] for row in db.execute("SELECT id FROM articles")) == ["story-1", "story-2"]
+
+
+def test_watermark_advances_once_every_item_is_saved(fetch):
+    fetch_news, http, db = fetch
+    http.broken = False
+
+    fetch_news.fetch_tech_articles()
+    assert db.execute("SELECT etag FROM feed_watermarks").fetchone()["etag"] == FEED_ETAG
+
+    http.requests.clear()
+    fetch_news.fetch_tech_articles()
+    assert http.requests == [(http.requests[0][0], FEED_ETAG)]  # 304, nothing downloaded
+
+
+def test_copies_in_one_run_are_downloaded_once(fetch):
+    fetch_news, http, db = fetch
+    http.broken = False
+    # The same story under two guids, and a tracking parameter on the second link
+    http.stories = [
+        ("story-1", "https://site1.example/story", "Chips story one"),
+        ("story-1-copy", "https://site1.example/story?utm_source=feed", "Chips story one, again"),
+    ]
+
+    fetch_news.fetch_tech_articles()
+    downloads = [r for r in http.requests if "site1.example" in r[0]]
+    assert len(downloads) == 1
+    assert [row["id"] for row in db.execute("SELECT id FROM articles")] == ["story-1"]
+    assert db.execute("SELECT etag FROM feed_watermarks").fetchone()["etag"] == FEED_ETAG  # Both items done
+
+
+def test_waiting_copy_is_matched_against_its_own_batch(fetch):
+    fetch_news, http, db = fetch
+    state = fetch_news.FeedState()
+
+    def item(guid, batch):
+        return {"id": guid, "article_url": "https://site1.example/story", "title": "Chips and GPUs",
+                "source": "Example", "pub_date": None, "feed_keywords": [], "known_terms": None,
+                "batch": batch, "feed_keys": [f"google:{' OR '.join(batch)}"]}
+
+    first, copy = item("story-1", ["chips"]), item("story-1-copy", ["gpus"])
+    assert state.dedupe(first) is first
+    assert state.dedupe(copy) is None  # Parked until story-1's keywords are known
+
+    first.update(keywords=["chips", "gpus"], text=None, etag=None, last_modified=None)
+    matched = fetch_news.match_keywords([first], state=state)
+    assert sorted((a["id"], tuple(a["keywords"])) for a in matched) == [("story-1", ("chips",)), ("story-1", ("gpus",))]
+
+    # A copy arriving later reuses the keywords straight away, no download
+    late = state.dedupe(item("story-1-late", ["gpus"]))
+    assert late["id"] == "story-1" and late["known_terms"] == ["chips", "gpus"]
@@ -0,0 +1,49 @@
+import os
+import sys
+import pytest
+
+from flask import Flask
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import metrics
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    metrics.init_app(app)
+    return app.test_client()
+
+
+def get(client, addr, **headers):
+    return client.get("/metrics", environ_base={"REMOTE_ADDR": addr}, headers=headers).status_code
+
+
+def test_metrics_are_local_only_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(metrics, "TOKEN", None)
+    assert get(client, "127.0.0.1") == 200
+    assert get(client, "203.0.113.9") == 404
+    assert get(client, "127.0.0.1", **{"X-Forwarded-For": "203.0.113.9"}) == 404  # Behind a proxy
+
+
+def test_metrics_need_the_token_when_one_is_set(client, monkeypatch):
+    monkeypatch.setattr(metrics, "TOKEN", "s3cret")
+    assert get(client, "127.0.0.1") == 404
+    assert get(client, "203.0.113.9", Authorization="Bearer wrong") == 404
+    assert get(client, "203.0.113.9", Authorization="Bearer s3cret") == 200
+
+
+def test_cursor_statements_are_timed(tmp_path):
+    os.environ.setdefault("GEMINI_API_KEY", "test")
+    import helpers
+
+    def count():
+        return sum(row[-1] for key, row in helpers.SQL_SECONDS.values.items() if dict(key).get("kind") == "select")
+
+    db = helpers.TimedConnection(str(tmp_path / "t.db"))
+    before = count()
+    db.execute("SELECT 1")
+    db.cursor().execute("SELECT 2")
+    assert count() == before + 2
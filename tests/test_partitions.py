@@ -0,0 +1,101 @@
+import os
+import sys
+import sqlite3
+import pytest
+
+from datetime import timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import partitions
+
+COLUMNS = "id, article_url, source, pub_date, keywords, title, fetched_at"
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Single-table database switched to per-day partitions, with one article today and one three days ago"""
+
+    from benchmarks.seed import create_db
+    db = create_db(str(tmp_path / "technus.db"))
+    today = partitions.today()
+    old = today - timedelta(days=3)
+    db.executemany(f"INSERT INTO articles ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", [
+        ("new", "https://example.com/new", "Example", None, '["ai"]', "New story", today.isoformat()),
+        ("old", "https://example.com/old", "Example", None, '["ai"]', "Old story", old.isoformat()),
+    ])
+    db.commit()
+
+    monkeypatch.setattr(partitions, "MODE", "day")
+    partitions.invalidate()
+    partitions.init_partitions(db)
+    yield db
+    partitions.invalidate()
+    db.close()
+
+
+def rows(db, table):
+    return [tuple(r) for r in db.execute(f"SELECT id, summary FROM {table} ORDER BY id")]
+
+
+def test_rows_move_to_their_day(db):
+    assert partitions.is_view(db)
+    today, old = partitions.partition_name(partitions.today()), partitions.partition_name(
+        partitions.today() - timedelta(days=3))
+    assert partitions.list_partitions(db) == [old, today]
+    assert rows(db, today) == [("new", None)]
+    assert rows(db, old) == [("old", None)]
+    assert rows(db, "articles") == [("new", None), ("old", None)]
+
+
+def test_update_through_the_view_reaches_the_partition(db):
+    db.execute("UPDATE articles SET summary = 'Short' WHERE id = 'old'")
+    db.commit()
+
+    old = partitions.partition_name(partitions.today() - timedelta(days=3))
+    assert rows(db, old) == [("old", "Short")]
+    assert rows(db, "articles") == [("new", None), ("old", "Short")]
+
+
+def test_delete_through_the_view_reaches_the_partition(db):
+    db.execute("DELETE FROM articles WHERE id = 'new'")
+    db.commit()
+
+    assert rows(db, partitions.partition_name(partitions.today())) == []
+    assert rows(db, "articles") == [("old", None)]
+
+
+def test_new_partition_is_added_to_the_view_and_triggers(db):
+    tomorrow = partitions.today() + timedelta(days=1)
+    name = partitions.ensure_partition(db, tomorrow)
+    db.execute(f"INSERT INTO {name} ({COLUMNS}) VALUES ('next', 'https://example.com/next', 'Example', NULL, "
+               f"'[]', 'Next story', ?)", (tomorrow.isoformat(),))
+    db.execute("UPDATE articles SET summary = 'Later' WHERE id = 'next'")
+    db.commit()
+
+    assert rows(db, name) == [("next", "Later")]
+
+
+def test_dropping_old_days_rebuilds_the_view(db):
+    dropped = []
+    assert partitions.drop_partitions_before(db, partitions.today(), on_drop=dropped.extend) == 1
+    assert dropped == ["old"]
+    assert partitions.list_partitions(db) == [partitions.partition_name(partitions.today())]
+
+    # View and triggers only name tables that still exist
+    assert rows(db, "articles") == [("new", None)]
+    db.execute("UPDATE articles SET summary = 'Still works' WHERE id = 'new'")
+    db.execute("DELETE FROM articles WHERE id = 'missing'")
+    db.commit()
+
+
+def test_switching_back_merges_into_one_table(db, monkeypatch):
+    monkeypatch.setattr(partitions, "MODE", "")
+    partitions.init_partitions(db)
+
+    assert not partitions.is_view(db)
+    assert partitions.list_partitions(db) == []
+    assert rows(db, "articles") == [("new", None), ("old", None)]
+    with pytest.raises(sqlite3.IntegrityError):
+        db.execute(f"INSERT INTO articles ({COLUMNS}) VALUES ('new', 'x', 'x', NULL, '[]', 'x', NULL)")
@@ -0,0 +1,91 @@
+import os
+import sys
+import pytest
+
+from flask import Flask, session
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """A bare app on the sqlite session backend, with a temporary database"""
+
+    monkeypatch.chdir(tmp_path)
+    os.environ.setdefault("GEMINI_API_KEY", "test")
+
+    from benchmarks.seed import create_db
+    path = str(tmp_path / "technus.db")
+    create_db(path).close()
+
+    import helpers
+    import sessions
+    db = helpers.connect(path)
+
+    app = Flask(__name__)
+    app.secret_key = "test"
+    sessions.init_app(app, "sqlite")
+    app.session_interface.get_db = lambda: db
+
+    @app.route("/visit")
+    def visit():
+        session["visits"] = session.get("visits", 0) + 1
+        return str(session.get("user_id"))
+
+    @app.route("/login")
+    def login():
+        sessions.regenerate(app, session)
+        session["user_id"] = 7
+        return "ok"
+
+    @app.route("/logout")
+    def logout():
+        session.clear()
+        return "ok"
+
+    client = app.test_client()
+    client.db = db
+    yield client
+    db.close()
+
+
+def sid(client):
+    cookie = client.get_cookie("session")
+    return cookie.value if cookie else None
+
+
+def stored(client):
+    return [row["id"] for row in client.db.execute("SELECT id FROM sessions")]
+
+
+def test_session_round_trip(client):
+    client.get("/visit")
+    first = sid(client)
+    assert first and stored(client) == [first]
+
+    client.get("/visit")
+    assert sid(client) == first  # Same row, updated in place
+    assert stored(client) == [first]
+
+
+def test_login_issues_a_new_session_id(client):
+    client.get("/visit")
+    planted = sid(client)
+
+    client.get("/login")
+    assert sid(client) != planted
+    assert stored(client) == [sid(client)]  # The planted id's row is gone
+    assert client.get("/visit").text == "7"
+
+    # Someone still holding the planted id isn't logged in
+    other = client.application.test_client()
+    other.set_cookie("session", planted)
+    assert other.get("/visit").text == "None"
+
+
+def test_logout_deletes_the_row(client):
+    client.get("/login")
+    client.get("/logout")
+    assert stored(client) == []
+    assert sid(client) is None
@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+URL = "https://example.com/story"
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.environ.setdefault("GEMINI_API_KEY", "test")
+
+    from benchmarks.seed import create_db
+    path = str(tmp_path / "technus.db")
+    create_db(path).close()
+
+    import helpers
+    db = helpers.connect(path)
+    yield db
+    db.close()
+
+
+def writes(db, func):
+    statements = []
+    db.set_trace_callback(statements.append)
+    try:
+        func()
+    finally:
+        db.set_trace_callback(None)
+    return [sql for sql in statements if sql.split()[0].upper() in ("UPDATE", "COMMIT")]
+
+
+def test_cached_reads_only_touch_now_and_then(db):
+    import text_cache
+    text_cache.store_text(db, URL, None, "Story text")
+    db.commit()
+
+    # Just stored: recent enough, a read is a read
+    assert writes(db, lambda: text_cache.get_text(db, URL)) == []
+    assert text_cache.get_text(db, URL)["text"] == "Story text"
+
+    # Recency older than TOUCH_AFTER is refreshed once
+    old = time.time() - text_cache.TOUCH_AFTER - 1
+    db.execute("UPDATE article_texts SET accessed_at = ?", (old,))
+    db.commit()
+    assert len(writes(db, lambda: text_cache.get_text(db, URL))) == 2
+    assert writes(db, lambda: text_cache.get_text(db, URL)) == []
+    assert db.execute("SELECT accessed_at FROM article_texts").fetchone()[0] > old
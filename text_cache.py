@@ -0,0 +1,136 @@
+import os
+import time
+import zlib
+import metrics
+import requests
+
+from newspaper import Article, Config
+
+config = Config()
+config.browser_user_agent = os.environ.get("USER_AGENT")
+
+MAX_BYTES = int(os.environ.get("TEXT_CACHE_MAX_BYTES", 64 * 1024 * 1024))  # Compressed size budget
+REVALIDATE_AFTER = 6 * 60 * 60  # Seconds before a cached text is checked with the origin again
+TOUCH_AFTER = 10 * 60           # Seconds a read's recency may lag (eviction doesn't need it finer)
+
+CACHE_REQUESTS = metrics.counter("cache_requests", "Cache lookups by cache and result")
+DOWNLOAD_SECONDS = metrics.histogram("download_seconds", "Time downloading article pages", server_timing="download")
+PARSE_SECONDS = metrics.histogram("parse_seconds", "Time extracting article text from html", server_timing="parse")
+
+
+def parse_text(url, html):
+    """Extract clean article text from already downloaded html"""
+
+    with PARSE_SECONDS.time():
+        article = Article(url, config=config)
+        article.download(input_html=html)
+        article.parse()
+        return article.text.strip()
+
+
+def fetch_text(url, etag=None, last_modified=None):
+    """Download and parse the article, revalidating with the given validators
+
+    Returns (text, etag, last_modified), text is None when the origin says 304.
+    """
+
+    headers = {"User-Agent": config.browser_user_agent} if config.browser_user_agent else {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    with DOWNLOAD_SECONDS.time(source="extract", result="error") as labels:
+        response = requests.get(url, headers=headers, timeout=10)
+        if response.status_code == 304:
+            labels["result"] = "not_modified"
+            return None, etag, last_modified
+        response.raise_for_status()
+        labels["result"] = "ok"
+
+    text = parse_text(url, response.text)
+    return text, response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+
+def get_text(db, url):
+    """Return cached row (text, etag, last_modified, stale) for url, or None"""
+
+    row = db.execute(
+        "SELECT body, etag, last_modified, stored_at, accessed_at FROM article_texts WHERE url = ?",
+        (url,)).fetchone()
+    if not row:
+        CACHE_REQUESTS.inc(cache="text", result="miss")
+        return None
+
+    stale = time.time() - row["stored_at"] > REVALIDATE_AFTER
+    CACHE_REQUESTS.inc(cache="text", result="stale" if stale else "hit")
+
+    # Mark as recently used for LRU, at most once per TOUCH_AFTER: a read shouldn't
+    # take the write lock (the fetcher's) every time
+    now = time.time()
+    if now - row["accessed_at"] > TOUCH_AFTER:
+        db.execute("UPDATE article_texts SET accessed_at = ? WHERE url = ?", (now, url))
+        db.commit()
+
+    return {
+        "text": zlib.decompress(row["body"]).decode("utf-8"),
+        "etag": row["etag"],
+        "last_modified": row["last_modified"],
+        "stale": stale,
+    }
+
+
+def touch_text(db, url):
+    """Origin confirmed the cached copy is current"""
+
+    db.execute("UPDATE article_texts SET stored_at = ? WHERE url = ?", (time.time(), url))
+    db.commit()
+
+
+def store_text(db, url, article_id, text, etag=None, last_modified=None):
+    """Save compressed article text, then evict least recently used rows over budget"""
+
+    store_texts(db, [(url, article_id, text, etag, last_modified)])
+
+
+def store_texts(db, entries):
+    """Save many (url, article_id, text, etag, last_modified) at once, evicting after"""
+
+    now = time.time()
+    rows = []
+    for url, article_id, text, etag, last_modified in entries:
+        if not text:
+            continue
+        body = zlib.compress(text.encode("utf-8"), 6)
+        rows.append((url, article_id, body, len(body), etag, last_modified, now, now))
+
+    if not rows:
+        return
+
+    db.executemany("""
+        INSERT INTO article_texts (url, article_id, body, size, etag, last_modified, stored_at, accessed_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (url) DO UPDATE SET
+            article_id = COALESCE(excluded.article_id, article_id),
+            body = excluded.body,
+            size = excluded.size,
+            etag = excluded.etag,
+            last_modified = excluded.last_modified,
+            stored_at = excluded.stored_at,
+            accessed_at = excluded.accessed_at
+    """, rows)
+    evict(db)
+
+
+def evict(db, max_bytes=MAX_BYTES):
+    """Keep the most recently used texts that fit in max_bytes"""
+
+    db.execute("""
+        DELETE FROM article_texts WHERE url IN (
+            SELECT url FROM (
+                SELECT url, SUM(size) OVER (ORDER BY accessed_at DESC) AS running
+                FROM article_texts
+            )
+            WHERE running > ?
+        )
+    """, (max_bytes,))
@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import signal
+import metrics
+import argparse
+import threading
+import traceback
+
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Imported once: newspaper, nltk, sklearn, the Gemini client and the embedding store stay warm between runs
+from fetch_news import fetch_tech_articles
+from clean_up import delete_old_articles, compact_embedding_store
+from helpers import embedding_store, close_thread_db
+
+from dotenv import load_dotenv
+load_dotenv()  # Always load first
+
+FETCH_INTERVAL = int(os.environ.get("FETCH_INTERVAL", 6 * 60 * 60))       # Seconds between fetches
+CLEANUP_INTERVAL = int(os.environ.get("CLEANUP_INTERVAL", 24 * 60 * 60))  # Seconds between cleanups
+COMPACT_INTERVAL = int(os.environ.get("COMPACT_INTERVAL", 24 * 60 * 60))  # Seconds between embedding compactions
+STATUS_PORT = int(os.environ.get("WORKER_STATUS_PORT", 8766))             # 0 disables /status
+
+
+class Job:
+    """A function run every `interval` seconds, never overlapping itself"""
+
+    def __init__(self, name, func, interval, shared: threading.Lock = None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.next_run = time.time()  # Run once on start
+        self._running = threading.Lock()
+        self._shared = shared  # Held while running by every job that mustn't overlap this one
+
+        # Last-run info
+        self.runs = 0
+        self.failures = 0
+        self.last_started = None
+        self.last_duration = None
+        self.last_status = "never run"
+        self.last_error = None
+
+    def due(self, now):
+        return now >= self.next_run
+
+    def start(self):
+        """Run in a background thread, skipped if the previous run is still going"""
+
+        if not self._running.acquire(blocking=False):
+            print(f"[{self.name}] still running, skipped this slot")
+            self.next_run = time.time() + self.interval
+            return False
+
+        # A conflicting job is running: stay due, try again on the next tick
+        if self._shared and not self._shared.acquire(blocking=False):
+            self._running.release()
+            return False
+
+        self.next_run = time.time() + self.interval
+        threading.Thread(target=self._run_in_thread, name=self.name, daemon=True).start()
+        return True
+
+    def run_now(self):
+        """Run in this thread, waiting for a run in progress to finish first"""
+
+        self._running.acquire()
+        if self._shared:
+            self._shared.acquire()
+        self._run()
+
+    def _run_in_thread(self):
+        try:
+            self._run()
+        finally:
+            close_thread_db()  # The thread ends here, its connections would linger until collected
+
+    def _run(self):
+        """Run the job, the caller holds the running (and shared) lock"""
+
+        start = time.perf_counter()
+        self.last_started = datetime.now().isoformat(timespec="seconds")
+        self.last_status = "running"
+        try:
+            self.func()
+            self.last_status = "ok"
+            self.last_error = None
+        except Exception as e:
+            self.failures += 1
+            self.last_status = "failed"
+            self.last_error = str(e)
+            traceback.print_exc()
+        finally:
+            self.runs += 1
+            self.last_duration = round(time.perf_counter() - start, 3)
+            print(f"[{self.name}] {self.last_status} in {self.last_duration}s")
+            if self._shared:
+                self._shared.release()
+            self._running.release()
+
+    def status(self):
+        return {
+            "interval_s": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "running": self._running.locked(),
+            "last_started": self.last_started,
+            "last_duration_s": self.last_duration,
+            "last_status": self.last_status,
+            "last_error": self.last_error,
+            "next_run": datetime.fromtimestamp(self.next_run).isoformat(timespec="seconds"),
+        }
+
+
+class Scheduler:
+    """Start due jobs until stopped"""
+
+    def __init__(self, jobs: list[Job], tick: float = 1.0):
+        self.jobs = jobs
+        self.tick = tick
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            now = time.time()
+            for job in self.jobs:
+                if job.due(now):
+                    job.start()
+            self.stopped.wait(self.tick)
+
+    def stop(self, *args):
+        self.stopped.set()
+
+    def status(self):
+        status = {job.name: job.status() for job in self.jobs}
+        status["embedding_cache"] = embedding_store.stats()  # Hit rate and evictions, to tune capacity
+        return status
+
+
+def serve_status(scheduler, port):
+    """Expose last-run timings as JSON on http://127.0.0.1:<port>/status (and metrics on /metrics)"""
+
+    class StatusHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/status":
+                data, content_type = json.dumps(scheduler.status(), indent=2).encode(), "application/json"
+            elif self.path == "/metrics":
+                data, content_type = metrics.render().encode(), metrics.CONTENT_TYPE
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass  # Quiet
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), StatusHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run fetch and cleanup jobs on a schedule")
+    parser.add_argument("--once", action="store_true", help="run each job once and exit")
+    args = parser.parse_args()
+
+    # Compaction keeps only terms already in article_terms, which a running fetch
+    # writes in chunks: it would drop embeddings the fetch has just paid for
+    embeddings = threading.Lock()
+    jobs = [
+        Job("fetch", fetch_tech_articles, FETCH_INTERVAL, shared=embeddings),
+        Job("cleanup", delete_old_articles, CLEANUP_INTERVAL),
+        Job("compact", compact_embedding_store, COMPACT_INTERVAL, shared=embeddings),
+    ]
+
+    # Jobs share one SQLite db, so run them back to back when asked for a single pass
+    if args.once:
+        for job in jobs:
+            job.run_now()
+        print(json.dumps(Scheduler(jobs).status(), indent=2))
+        return
+
+    scheduler = Scheduler(jobs)
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+
+    if STATUS_PORT:
+        serve_status(scheduler, STATUS_PORT)
+        print(f"Worker status on http://127.0.0.1:{STATUS_PORT}/status")
+
+    scheduler.run()
+
+
+if __name__ == "__main__":
+    main()